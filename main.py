@@ -1,104 +1,957 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
 import re
+import unicodedata
+import math
 import threading
+import queue
+import itertools
 from urllib.parse import quote, unquote
 from datetime import datetime
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ImageFilter, ImageOps
 import io
+import hashlib
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import DictCursor, SSDictCursor
+from pymysql.constants import SERVER_STATUS
+import sqlite3
 import time
-from collections import OrderedDict
+import sys
+import csv
+import argparse
+from collections import OrderedDict, deque
+from contextlib import contextmanager, redirect_stdout
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, Future
 import webbrowser
 from urllib.parse import quote
 
+# 本地缓存目录（接口响应等），重启后仍然有效
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".animes_cache")
+
+# 数据库后端：mysql（远程服务器）或 sqlite（本地嵌入式数据库）
+DB_BACKEND = os.environ.get("ANIMES_DB_BACKEND", "mysql")
+SQLITE_DB_PATH = os.environ.get("ANIMES_SQLITE_PATH",
+                                os.path.join(os.path.expanduser("~"), ".animes_data", "animes.sqlite3"))
+
+# Bangumi接口地址（可指向本地模拟服务器测试）和搜索方式：
+# legacy 使用 GET /search/subject/{关键词}，v0 使用 POST /v0/search/subjects
+BANGUMI_API_BASE = os.environ.get("ANIMES_BANGUMI_API", "https://api.bgm.tv").rstrip("/")
+SEARCH_BACKEND = os.environ.get("ANIMES_SEARCH_BACKEND", "legacy")
+
+# 边输入边搜索的防抖时间（毫秒），0 表示只在按回车或点击搜索时搜索
+SEARCH_DEBOUNCE_MS = int(os.environ.get("ANIMES_SEARCH_DEBOUNCE_MS", "0"))
+
+# 界面增量渲染每帧的时间预算（毫秒），超出后让出事件循环
+RENDER_FRAME_BUDGET_MS = float(os.environ.get("ANIMES_RENDER_BUDGET_MS", "12"))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def create_http_session(pool_size=10, retries=3, backoff_factor=0.5):
+    """创建HTTP会话：按并发数设置连接池大小，复用keep-alive连接，429/5xx时退避重试"""
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False  # 重试用尽后返回最后的响应，由raise_for_status处理
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class DiskCache:
+    """磁盘缓存类，按键的哈希保存原始字节，按总大小和存放时间淘汰"""
+    # 超出容量时一次淘汰到容量的这个比例，避免之后每次写入都要淘汰
+    LOW_WATER_RATIO = 0.9
+    
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        
+        # 内存中的文件列表：路径 -> 大小，按最近使用时间排列（最久未使用的在前），只在启动时扫描目录
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.prune()
+    
+    def _path(self, key):
+        """根据键的哈希生成文件路径"""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+    
+    def _scan(self):
+        """列出缓存文件 (路径, 大小, 修改时间)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            # 跳过正在写入的临时文件
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+    
+    def contains(self, key):
+        """检查缓存文件是否存在"""
+        return os.path.exists(self._path(key))
+    
+    def get(self, key):
+        """读取缓存字节，不存在或已过期时返回None"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.max_age:
+                self._remove(path)
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 更新修改时间，作为最近使用时间（重启后按它恢复顺序）
+            os.utime(path)
+        except OSError:
+            return None
+        
+        with self.lock:
+            if path in self.entries:
+                self.entries.move_to_end(path)
+        return data
+    
+    def set(self, key, data):
+        """写入缓存字节"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入磁盘缓存失败 {key}: {e}")
+            return
+        
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(path, 0)
+            self.entries[path] = len(data)
+            victims = self._evict_locked()
+        self._delete_files(victims)
+    
+    def _evict_locked(self):
+        """超出容量时按最近使用时间从列表中移除文件直到低水位，返回待删除的路径（调用方持有锁）"""
+        victims = []
+        if self.total_bytes <= self.max_bytes:
+            return victims
+        low_water = self.max_bytes * self.LOW_WATER_RATIO
+        while self.entries and self.total_bytes > low_water:
+            victim, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            victims.append(victim)
+        return victims
+    
+    @staticmethod
+    def _delete_files(paths):
+        """在锁外删除文件"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def _remove(self, path):
+        """删除缓存文件"""
+        self._delete_files([path])
+        with self.lock:
+            self.total_bytes -= self.entries.pop(path, 0)
+    
+    def prune(self):
+        """扫描目录重建文件列表：删除过期文件，并按最近使用时间淘汰到低水位"""
+        now = time.time()
+        entries = []
+        for path, size, mtime in self._scan():
+            if now - mtime > self.max_age:
+                self._delete_files([path])
+            else:
+                entries.append((path, size, mtime))
+        
+        # 最久未使用的文件在前
+        entries.sort(key=lambda entry: entry[2])
+        with self.lock:
+            self.entries = OrderedDict((path, size) for path, size, _ in entries)
+            self.total_bytes = sum(self.entries.values())
+            victims = self._evict_locked()
+        self._delete_files(victims)
+
+
+class DownloadPool:
+    """有界下载线程池，按优先级执行任务（数值越小越先执行）"""
+    def __init__(self, max_workers=6):
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()  # 同优先级按提交顺序执行
+        self.workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker, name=f"image-download-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+    
+    def submit(self, priority, func, *args):
+        """提交任务，返回Future"""
+        future = Future()
+        self.queue.put((priority, next(self.counter), func, args, future))
+        return future
+    
+    def _worker(self):
+        """工作线程：不断从优先级队列取任务执行"""
+        while True:
+            _, _, func, args, future = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+
+# Bangumi封面各版本的宽度（像素），large为原图；URL中带 /r/<宽度>/ 时以URL为准
+COVER_VARIANT_WIDTHS = {'grid': 100, 'small': 200, 'common': 400, 'medium': 800}
+
+def _cover_variant_width(name, url):
+    """封面版本的宽度，原图或未知时返回None"""
+    match = re.search(r'/r/(\d+)(?:x\d+)?/', url)
+    if match:
+        return int(match.group(1))
+    return COVER_VARIANT_WIDTHS.get(name)
+
+def select_cover_url(anime_info, size):
+    """按目标尺寸选择封面URL：宽度不小于目标宽度的最小版本，没有多尺寸信息时使用cover_url"""
+    images = anime_info.get('images')
+    if not images and anime_info.get('cover_images'):
+        try:
+            images = json.loads(anime_info['cover_images'])
+        except ValueError:
+            images = None
+    if not images:
+        return anime_info.get('cover_url') or ''
+    
+    candidates = []
+    for name, url in images.items():
+        if not url:
+            continue
+        width = _cover_variant_width(name, url)
+        if width is not None and width >= size[0]:
+            candidates.append((width, url))
+    if candidates:
+        return min(candidates)[1]
+    return images.get('large') or anime_info.get('cover_url') or ''
+
 class ImageCache:
-    """图片缓存管理类"""
-    def __init__(self, max_size=100):
+    """图片缓存管理类（内存LRU + 磁盘缓存两级）"""
+    # 下载优先级：界面上可见的封面优先，预加载最后
+    PRIORITY_VISIBLE = 0
+    PRIORITY_PRELOAD = 10
+    
+    # 流式下载：每次读取的块大小，以及收到多少字节后生成模糊预览
+    CHUNK_SIZE = 16 * 1024
+    PREVIEW_BYTES = 24 * 1024
+    
+    def __init__(self, max_bytes=128 * 1024 * 1024, disk_cache=None, max_workers=6):
         self.cache = OrderedDict()
-        self.max_size = max_size
+        self.max_bytes = max_bytes
         self.lock = threading.Lock()
+        
+        # 共享的有界下载线程池，以及与之并发数一致的HTTP连接池
+        self.pool = DownloadPool(max_workers)
+        self.session = create_http_session(pool_size=max_workers)
+        
+        # 正在下载中的URL -> 下载任务，同一URL只下载一次
+        self.pending = {}
+        
+        # 内存占用统计（按解码后的大小估算）
+        self.sizes = {}
+        self.current_bytes = 0
+        self.evictions = 0
+        
+        # 磁盘缓存保存原始图片字节，重启后仍然有效
+        if disk_cache is None:
+            disk_cache = DiskCache(os.path.join(CACHE_DIR, "covers"))
+        self.disk_cache = disk_cache
+    
+    @staticmethod
+    def _thumbnail_key(url, size):
+        """缩略图在磁盘缓存中的键"""
+        return f"{url}#thumbnail={size[0]}x{size[1]}"
+    
+    @staticmethod
+    def _decode(data, size):
+        """解码图片字节并缩放到size以内；JPEG使用draft按1/2、1/4、1/8缩小解码"""
+        image = Image.open(io.BytesIO(data))
+        if image.format == 'JPEG':
+            # draft只会选择不小于size的缩放比例，之后的thumbnail保证最终尺寸
+            image.draft(None, tuple(size))
+        image.load()
+        image.thumbnail(size)
+        return image
+    
+    @staticmethod
+    def _decode_preview(data, size):
+        """用已收到的部分JPEG字节生成模糊的低分辨率预览，无法生成时返回None"""
+        if not data.startswith(b'\xff\xd8'):
+            return None
+        try:
+            # 补上结束标记，libjpeg会把缺失的部分当作空白；渐进式JPEG得到的是整张的粗略图像
+            image = Image.open(io.BytesIO(bytes(data) + b'\xff\xd9'))
+            image.draft('RGB', (max(size[0] // 4, 1), max(size[1] // 4, 1)))
+            image.load()
+            preview = ImageOps.contain(image.convert('RGB'), tuple(size))
+            return preview.filter(ImageFilter.GaussianBlur(2))
+        except Exception:
+            return None
     
-    def get(self, url):
-        """从缓存获取图片"""
+    def get_thumbnail(self, url, size, data=None):
+        """获取指定尺寸的缩略图，按 (url, size) 缓存，原图不在磁盘缓存中时返回None
+        
+        data为原图字节，提供或磁盘中有原图时直接按目标尺寸缩小解码，不解码完整的原图
+        """
+        key = (url, tuple(size))
         with self.lock:
-            if url in self.cache:
-                # 将最近使用的项移到末尾
-                self.cache.move_to_end(url)
-                return self.cache[url]
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        
+        # 磁盘中已有生成好的缩略图；无法解码时从原图重新生成
+        cached = self.disk_cache.get(self._thumbnail_key(url, size))
+        if cached is not None:
+            try:
+                thumbnail = Image.open(io.BytesIO(cached))
+                thumbnail.load()
+                self._set_memory(key, thumbnail)
+                return thumbnail
+            except Exception as e:
+                print(f"读取缩略图缓存失败 {url}: {e}")
+        
+        # 从原图字节按目标尺寸缩小解码生成缩略图
+        if data is None:
+            data = self.disk_cache.get(url)
+        if data is None:
             return None
+        thumbnail = self._decode(data, size)
+        self._set_memory(key, thumbnail)
+        self.disk_cache.set(self._thumbnail_key(url, size), self._encode_thumbnail(thumbnail))
+        return thumbnail
+    
+    @staticmethod
+    def _encode_thumbnail(image):
+        """将缩略图编码为字节，无透明通道时使用JPEG"""
+        buffer = io.BytesIO()
+        if image.mode in ('RGB', 'L'):
+            image.save(buffer, format='JPEG', quality=90)
+        else:
+            image.save(buffer, format='PNG')
+        return buffer.getvalue()
     
-    def set(self, url, image):
-        """将图片添加到缓存"""
+    def contains(self, url):
+        """检查原图是否已在磁盘缓存中（内存中只保存缩略图）"""
+        return self.disk_cache.contains(url)
+    
+    @staticmethod
+    def _image_size(image):
+        """估算图片解码后占用的字节数（宽 × 高 × 通道数）"""
+        width, height = image.size
+        return width * height * len(image.getbands())
+    
+    def _set_memory(self, key, image):
+        """将缩略图添加到内存缓存，键为 (url, size)"""
+        size = self._image_size(image)
         with self.lock:
-            if url in self.cache:
+            if key in self.cache:
                 # 如果已存在，移到末尾
-                self.cache.move_to_end(url)
+                self.cache.move_to_end(key)
+                return
+            
+            # 单张图片超过整个预算时不放入内存
+            if size > self.max_bytes:
+                return
+            
+            # 超出内存预算时，移除最久未使用的项
+            while self.cache and self.current_bytes + size > self.max_bytes:
+                old_key, _ = self.cache.popitem(last=False)
+                self.current_bytes -= self.sizes.pop(old_key)
+                self.evictions += 1
+            
+            self.cache[key] = image
+            self.sizes[key] = size
+            self.current_bytes += size
+    
+    def stats(self):
+        """返回内存缓存统计信息"""
+        with self.lock:
+            return {
+                'entries': len(self.cache),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+    
+    def request_thumbnail(self, url, size, priority=PRIORITY_VISIBLE, on_preview=None):
+        """异步获取缩略图，返回Future；缓存中没有时按优先级排队下载原图
+        
+        on_preview(image) 在下载途中以模糊的低分辨率预览调用（在下载线程中执行，可能不调用）
+        """
+        result = Future()
+        key = (url, tuple(size))
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                result.set_result(self.cache[key])
+                return result
+        
+        # 读取磁盘和缩放都放到线程池中执行
+        self.pool.submit(priority, self._resolve_thumbnail, url, size, priority, result, on_preview)
+        return result
+    
+    def _resolve_thumbnail(self, url, size, priority, result, on_preview=None):
+        """在缓存中查找缩略图，没有时等待原图下载完成后生成"""
+        try:
+            thumbnail = self.get_thumbnail(url, size)
+        except Exception as e:
+            result.set_exception(e)
+            return
+        
+        if thumbnail is not None:
+            result.set_result(thumbnail)
+            return
+        
+        # 下载途中的预览按目标尺寸生成
+        preview = None
+        if on_preview is not None:
+            preview = lambda partial: self._send_preview(partial, size, on_preview)
+        
+        # 不在工作线程中阻塞等待，下载完成后通过回调生成缩略图
+        self.fetch(url, priority, on_preview=preview).add_done_callback(
+            lambda download: self._finish_thumbnail(url, size, download, result))
+    
+    def _send_preview(self, partial, size, on_preview):
+        """生成并发送下载途中的预览"""
+        preview = self._decode_preview(partial, size)
+        if preview is not None:
+            try:
+                on_preview(preview)
+            except Exception as e:
+                print(f"显示预览失败: {e}")
+    
+    def _finish_thumbnail(self, url, size, download, result):
+        """原图下载完成后生成缩略图"""
+        try:
+            result.set_result(self.get_thumbnail(url, size, data=download.result()))
+        except Exception as e:
+            result.set_exception(e)
+    
+    def fetch(self, url, priority=PRIORITY_PRELOAD, on_preview=None):
+        """获取原图字节，返回Future；同一URL的并发请求共享同一个下载任务
+        
+        原图只写入磁盘缓存，不在内存中解码；on_preview(partial) 在收到足够的字节后以已收到的部分调用一次
+        """
+        with self.lock:
+            task = self.pending.get(url)
+            if task is None:
+                task = {'future': Future(), 'priority': priority, 'started': False, 'previews': []}
+                self.pending[url] = task
+                queue_task = True
+            elif priority < task['priority'] and not task['started']:
+                # 已在排队的预加载被可见封面请求时提升优先级，重复的队列项只会执行一次
+                task['priority'] = priority
+                queue_task = True
             else:
-                # 如果缓存已满，移除最旧的项
-                if len(self.cache) >= self.max_size:
-                    self.cache.popitem(last=False)
-                self.cache[url] = image
+                queue_task = False
+            if on_preview is not None and not task['started']:
+                task['previews'].append(on_preview)
+        
+        if queue_task:
+            self.pool.submit(priority, self._download_image, url, task)
+        return task['future']
     
     def preload(self, urls):
         """预加载图片列表"""
         for url in urls:
-            if url and url not in self.cache:
-                threading.Thread(target=self._download_image, args=(url,), daemon=True).start()
+            if url and not self.contains(url):
+                self.fetch(url, self.PRIORITY_PRELOAD)
     
-    def _download_image(self, url):
-        """下载图片并缓存"""
+    def _download_image(self, url, task):
+        """流式下载图片并写入磁盘缓存，结果（原图字节）通过future通知所有等待者"""
+        with self.lock:
+            if task['started']:
+                return
+            task['started'] = True
+        
+        future = task['future']
         try:
-            response = requests.get(url, timeout=10)
+            # 排队期间可能已被其他途径缓存
+            image_data = self.disk_cache.get(url)
+            if image_data is None:
+                image_data = self._stream_download(url, task['previews'])
+                self.disk_cache.set(url, image_data)
+                print(f"下载图片: {url}")
+        except Exception as e:
+            print(f"下载图片失败 {url}: {e}")
+            with self.lock:
+                self.pending.pop(url, None)
+            future.set_exception(e)
+            return
+        
+        with self.lock:
+            self.pending.pop(url, None)
+        future.set_result(image_data)
+    
+    def _stream_download(self, url, previews):
+        """分块读取响应，收到足够的字节后先发送预览"""
+        with self.session.get(url, timeout=10, stream=True) as response:
             response.raise_for_status()
+            data = bytearray()
+            previewed = not previews
+            for chunk in response.iter_content(self.CHUNK_SIZE):
+                data.extend(chunk)
+                if not previewed and len(data) >= self.PREVIEW_BYTES:
+                    previewed = True
+                    for on_preview in previews:
+                        on_preview(data)
+        return bytes(data)
+
+class ConnectionPool:
+    """数据库连接池：限制最大连接数，借出空闲较久的连接前检查是否可用，空闲过久的连接自动关闭"""
+    def __init__(self, factory, min_size=1, max_size=5, idle_timeout=300, check=None, timeout=10,
+                 check_after=30, in_transaction=None):
+        self.factory = factory          # 创建新连接的函数
+        self.check = check              # 借出前的健康检查，连接不可用时应抛出异常
+        self.check_after = check_after  # 空闲超过这么多秒的连接才做健康检查，刚归还的连接直接复用
+        self.in_transaction = in_transaction  # 判断连接上是否有未结束的事务，为None时归还前总是回滚
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout          # 连接全部被占用时的最长等待时间
+        
+        self.idle = deque()             # 空闲连接 (连接, 归还时间)
+        self.size = 0                   # 当前打开的连接总数
+        self.cond = threading.Condition()
+    
+    def warm_up(self):
+        """预先建立min_size个连接"""
+        with self.cond:
+            missing = self.min_size - self.size
+            self.size += missing
+        
+        for i in range(missing):
+            try:
+                conn = self.factory()
+            except Exception:
+                with self.cond:
+                    self.size -= missing - i
+                    self.cond.notify_all()
+                raise
+            self.release(conn)
+    
+    @contextmanager
+    def connection(self):
+        """借出一个连接，用完自动归还
+        
+        无论正常结束、出错还是生成器被提前关闭（GeneratorExit），都会回滚未提交的事务后归还
+        """
+        conn = self.acquire()
+        failed = True
+        try:
+            yield conn
+            failed = False
+        finally:
+            # 出错时总是回滚（回滚失败也能发现已损坏的连接）；正常结束时只回滚仍未结束的事务，
+            # 只读查询不再多一次往返
+            self._rollback_or_discard(conn, force=failed)
+    
+    def _rollback_or_discard(self, conn, force=True):
+        """回滚后归还连接，回滚失败说明连接已损坏，直接关闭"""
+        try:
+            if force or self.in_transaction is None or self.in_transaction(conn):
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+        else:
+            self.release(conn)
+    
+    def acquire(self):
+        """借出连接，优先复用最近归还的空闲连接"""
+        deadline = time.time() + self.timeout
+        while True:
+            with self.cond:
+                self._close_expired()
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("获取数据库连接超时")
+                    self.cond.wait(remaining)
+                
+                if self.idle:
+                    conn, returned_at = self.idle.pop()
+                else:
+                    conn = None
+                    self.size += 1
             
-            # 转换图片
-            image_data = response.content
-            image = Image.open(io.BytesIO(image_data))
+            if conn is None:
+                try:
+                    return self.factory()
+                except Exception:
+                    with self.cond:
+                        self.size -= 1
+                        self.cond.notify()
+                    raise
             
-            # 添加到缓存
-            self.set(url, image)
-            print(f"预加载图片: {url}")
-        except Exception as e:
-            print(f"预加载图片失败 {url}: {e}")
+            # 健康检查失败的连接直接丢弃，重新获取
+            try:
+                if self.check and time.time() - returned_at >= self.check_after:
+                    self.check(conn)
+                return conn
+            except Exception as e:
+                print(f"数据库连接不可用，已丢弃: {e}")
+                self._discard(conn)
+    
+    def release(self, conn):
+        """归还连接"""
+        with self.cond:
+            self.idle.append((conn, time.time()))
+            self.cond.notify()
+    
+    def _discard(self, conn):
+        """关闭并移除连接"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.cond:
+            self.size -= 1
+            self.cond.notify()
+    
+    def _close_expired(self):
+        """关闭空闲超时的连接，至少保留min_size个（调用方需持有锁）"""
+        now = time.time()
+        while self.idle and self.size > self.min_size and now - self.idle[0][1] > self.idle_timeout:
+            conn, _ = self.idle.popleft()
+            self.size -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.cond:
+            while self.idle:
+                conn, _ = self.idle.popleft()
+                self.size -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def normalize_title(title):
+    """标题的规范化键：NFKC（全角半角统一）、忽略大小写、去掉标点符号和空白，用于判断是否为同一部动漫"""
+    if not title:
+        return ''
+    text = unicodedata.normalize('NFKC', title).casefold()
+    key = ''.join(ch for ch in text if unicodedata.category(ch)[0] in 'LNM')
+    # 全是符号的标题保留规范化后的原文
+    return key or text.strip()
+
+
+# 数据库结构迁移，按版本号顺序执行，已执行的版本记录在 schema_version 表中。
+# 每个版本分别给出MySQL和SQLite的语句；语句需可重复执行（已存在的列/索引会被跳过）。
+# 'prepare' / 'backfill' 为可选的 DatabaseManager 方法名，分别在语句之前/之后以游标调用，处理无法用SQL完成的数据整理
+SCHEMA_VERSION_TABLE = {
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at DATETIME
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME
+        )
+    """
+}
+
+SCHEMA_MIGRATIONS = [
+    {
+        'version': 1,
+        'description': "创建基础数据表",
+        'mysql': [
+            """
+            CREATE TABLE IF NOT EXISTS userinfo (
+                uid INT AUTO_INCREMENT PRIMARY KEY,
+                tel VARCHAR(20),
+                mail VARCHAR(100),
+                uname VARCHAR(50),
+                pwd VARCHAR(100),
+                register_time DATETIME
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS animesinfo (
+                aid INT AUTO_INCREMENT PRIMARY KEY,
+                acn_name VARCHAR(255),
+                ajp_name VARCHAR(255),
+                abroadcast_time DATETIME,
+                episodes INT,
+                score DECIMAL(3, 1),
+                source VARCHAR(50),
+                introduce TEXT,
+                cover_url VARCHAR(500)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS recordinfo (
+                rid INT AUTO_INCREMENT PRIMARY KEY,
+                uid INT NOT NULL,
+                aid INT NOT NULL,
+                state VARCHAR(20) NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        ],
+        'sqlite': [
+            """
+            CREATE TABLE IF NOT EXISTS userinfo (
+                uid INTEGER PRIMARY KEY AUTOINCREMENT,
+                tel TEXT,
+                mail TEXT,
+                uname TEXT,
+                pwd TEXT,
+                register_time DATETIME
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS animesinfo (
+                aid INTEGER PRIMARY KEY AUTOINCREMENT,
+                acn_name TEXT,
+                ajp_name TEXT,
+                abroadcast_time DATETIME,
+                episodes INTEGER,
+                score REAL,
+                source TEXT,
+                introduce TEXT,
+                cover_url TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS recordinfo (
+                rid INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid INTEGER NOT NULL,
+                aid INTEGER NOT NULL,
+                state TEXT NOT NULL
+            )
+            """
+        ]
+    },
+    {
+        # anime_exists:        (source, acn_name) 或 (source, ajp_name)     -> 两个 (source, 名称) 索引
+        # 按条目ID精确查找:     source = ? AND bgm_id = ?                    -> uk_animesinfo_source_bgm
+        # add_to_category:     uid = ? AND aid = ? AND state = ?            -> uk_recordinfo_user_anime_state
+        # get_animes_by_state: uid = ? AND state = ? 再按aid连接             -> idx_recordinfo_user_state（覆盖索引）
+        # 分类列表分页:         ORDER BY acn_name, aid                       -> idx_animesinfo_name（按索引顺序读取，无需排序）
+        'version': 2,
+        'description': "按查询路径添加索引，保存Bangumi条目ID",
+        # 旧版本先查后插可能留下重复的动漫和分类记录，创建唯一键之前由 DatabaseManager._merge_duplicate_rows 合并
+        'prepare': '_merge_duplicate_rows',
+        'mysql': [
+            "ALTER TABLE animesinfo ADD COLUMN bgm_id INT NULL",
+            "CREATE UNIQUE INDEX uk_animesinfo_source_name ON animesinfo (source, ajp_name)",
+            "CREATE INDEX idx_animesinfo_source_cn_name ON animesinfo (source, acn_name)",
+            "CREATE UNIQUE INDEX uk_animesinfo_source_bgm ON animesinfo (source, bgm_id)",
+            "CREATE UNIQUE INDEX uk_recordinfo_user_anime_state ON recordinfo (uid, aid, state)",
+            "CREATE INDEX idx_recordinfo_user_state ON recordinfo (uid, state, aid)",
+            "CREATE INDEX idx_animesinfo_name ON animesinfo (acn_name, aid)"
+        ],
+        'sqlite': [
+            "ALTER TABLE animesinfo ADD COLUMN bgm_id INTEGER",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uk_animesinfo_source_name ON animesinfo (source, ajp_name)",
+            "CREATE INDEX IF NOT EXISTS idx_animesinfo_source_cn_name ON animesinfo (source, acn_name)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uk_animesinfo_source_bgm ON animesinfo (source, bgm_id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uk_recordinfo_user_anime_state ON recordinfo (uid, aid, state)",
+            "CREATE INDEX IF NOT EXISTS idx_recordinfo_user_state ON recordinfo (uid, state, aid)",
+            "CREATE INDEX IF NOT EXISTS idx_animesinfo_name ON animesinfo (acn_name, aid)"
+        ]
+    },
+    {
+        'version': 3,
+        'description': "保存封面的所有尺寸版本（JSON）",
+        'mysql': [
+            "ALTER TABLE animesinfo ADD COLUMN cover_images TEXT NULL"
+        ],
+        'sqlite': [
+            "ALTER TABLE animesinfo ADD COLUMN cover_images TEXT"
+        ]
+    },
+    {
+        # anime_exists: source = ? AND cn_key = ? / source = ? AND jp_key = ?  -> 两个 (source, 规范化键) 索引
+        'version': 4,
+        'description': "保存规范化的标题键，按键判断动漫是否已存在",
+        'mysql': [
+            "ALTER TABLE animesinfo ADD COLUMN cn_key VARCHAR(255) NULL",
+            "ALTER TABLE animesinfo ADD COLUMN jp_key VARCHAR(255) NULL",
+            "CREATE INDEX idx_animesinfo_source_cn_key ON animesinfo (source, cn_key)",
+            "CREATE INDEX idx_animesinfo_source_jp_key ON animesinfo (source, jp_key)"
+        ],
+        'sqlite': [
+            "ALTER TABLE animesinfo ADD COLUMN cn_key TEXT",
+            "ALTER TABLE animesinfo ADD COLUMN jp_key TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_animesinfo_source_cn_key ON animesinfo (source, cn_key)",
+            "CREATE INDEX IF NOT EXISTS idx_animesinfo_source_jp_key ON animesinfo (source, jp_key)"
+        ],
+        # 已有的行由 DatabaseManager._backfill_title_keys 计算键
+        'backfill': '_backfill_title_keys'
+    },
+    {
+        # 分类列表按 (acn_name, aid) 游标分页，acn_name为NULL时行值比较结果为NULL，分页会提前结束；
+        # 与写入时一致，没有中文名的使用原名
+        'version': 5,
+        'description': "补全为NULL的中文名",
+        'mysql': [
+            "UPDATE animesinfo SET acn_name = COALESCE(ajp_name, ''), cn_key = jp_key WHERE acn_name IS NULL"
+        ],
+        'sqlite': [
+            "UPDATE animesinfo SET acn_name = COALESCE(ajp_name, ''), cn_key = jp_key WHERE acn_name IS NULL"
+        ]
+    },
+    {
+        # 同名的不同Bangumi条目（如重制版）会被 (source, ajp_name) 唯一键合并为一行；
+        # 有条目ID的行只按 (source, bgm_id) 唯一，原名唯一只约束没有条目ID的行。
+        # MySQL不支持部分索引，用只在bgm_id为NULL时取原名的生成列代替（唯一索引允许多个NULL）
+        'version': 6,
+        'description': "原名唯一键只约束没有条目ID的动漫",
+        'mysql': [
+            "ALTER TABLE animesinfo ADD COLUMN ajp_name_no_bgm VARCHAR(255) AS (IF(bgm_id IS NULL, ajp_name, NULL)) STORED",
+            "CREATE UNIQUE INDEX uk_animesinfo_source_name_no_bgm ON animesinfo (source, ajp_name_no_bgm)",
+            "DROP INDEX uk_animesinfo_source_name ON animesinfo"
+        ],
+        'sqlite': [
+            "CREATE UNIQUE INDEX IF NOT EXISTS uk_animesinfo_source_name_no_bgm ON animesinfo (source, ajp_name) WHERE bgm_id IS NULL",
+            "DROP INDEX IF EXISTS uk_animesinfo_source_name"
+        ]
+    }
+]
+
 
-class DatabaseManager:
-    def __init__(self):
-        self.connection = None
+class DatabaseManager(ABC):
+    """数据存储接口：各后端共用同一套操作，子类实现标记为抽象的方法（连接、事务状态和各自语法的upsert）"""
+    DIALECT = None  # 对应 SCHEMA_MIGRATIONS 中的键
+    
+    # animesinfo 写入的列，各后端的INSERT语句共用
+    ANIME_COLUMNS = ("acn_name, ajp_name, abroadcast_time, episodes, score, source, introduce, cover_url, bgm_id, cover_images, "
+                     "cn_key, jp_key")
+    ANIME_INSERT = f"INSERT INTO animesinfo ({ANIME_COLUMNS}) VALUES ({', '.join(['%s'] * len(ANIME_COLUMNS.split(',')))})"
+    
+    def __init__(self, min_connections=1, max_connections=5, auto_migrate=True):
+        self.auto_migrate = auto_migrate
+        self.pool = ConnectionPool(
+            self._create_connection,
+            min_size=min_connections,
+            max_size=max_connections,
+            check=self._check_connection,
+            in_transaction=self._in_transaction
+        )
+        
+        # 分类查询结果缓存，写入分类记录时失效
+        self.query_cache = {}
+        self.cache_generation = 0
+        self.cache_lock = threading.Lock()
+        
+        # 进程内的存在性索引：(规范化标题, 来源) -> aid，(来源, 条目ID) -> aid；
+        # 动漫不会被删除，只缓存已存在的结果，未命中时仍查询数据库
+        self.title_index = {}
+        self.bgm_index = {}
+        self.index_lock = threading.Lock()
+        
         self.connect()
     
+    @abstractmethod
+    def _create_connection(self):
+        """创建一个新的数据库连接，连接需支持 %s 占位符并以字典形式返回行"""
+    
+    @abstractmethod
+    def _check_connection(self, conn):
+        """借出前检查连接是否可用，不可用时抛出异常"""
+    
+    @abstractmethod
+    def _in_transaction(self, conn):
+        """连接上是否有未提交的事务；连接以自动提交模式执行只读查询，写入前调用 conn.begin() 开始事务"""
+    
     def connect(self):
         """连接数据库"""
         try:
-            self.connection = pymysql.connect(
-                host='cn-hk-bgp-4.ofalias.net',
-                user='root',
-                password='root',
-                database='animes_db',
-                charset='utf8mb4',
-                cursorclass=DictCursor,
-                port=39960
-            )
+            self.pool.warm_up()
             print("数据库连接成功")
+            if self.auto_migrate:
+                self.migrate()
         except Exception as e:
             print(f"数据库连接失败: {e}")
             messagebox.showerror("数据库错误", f"无法连接数据库: {e}")
     
-    def get_connection(self):
-        """获取数据库连接，如果断开则重连"""
-        if self.connection is None or not self.connection.open:
-            self.connect()
-        return self.connection
+    @abstractmethod
+    def _is_duplicate_schema_error(self, error):
+        """判断是否为“列/索引已存在”或“要删除的索引不存在”的错误，迁移时可以安全跳过"""
+    
+    def migrate(self, target_version=None):
+        """执行尚未执行的结构迁移（可指定目标版本），返回当前版本号"""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(SCHEMA_VERSION_TABLE[self.DIALECT])
+            conn.commit()
+            cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+            current = cursor.fetchone()['version'] or 0
+            
+            for migration in SCHEMA_MIGRATIONS:
+                version = migration['version']
+                if version <= current or (target_version is not None and version > target_version):
+                    continue
+                
+                print(f"执行数据库迁移 v{version}: {migration['description']}")
+                conn.begin()
+                # 执行语句之前需要的数据整理
+                if migration.get('prepare'):
+                    getattr(self, migration['prepare'])(cursor)
+                
+                for statement in migration[self.DIALECT]:
+                    try:
+                        cursor.execute(statement)
+                    except Exception as e:
+                        if not self._is_duplicate_schema_error(e):
+                            raise
+                        print(f"已存在，跳过: {e}")
+                
+                # 无法用SQL完成的数据迁移
+                if migration.get('backfill'):
+                    getattr(self, migration['backfill'])(cursor)
+                
+                cursor.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+                               (version, migration['description'], datetime.now()))
+                conn.commit()
+                current = version
+        
+        return current
     
     def check_user_exists(self, uid=1):
         """检查用户是否存在，如果不存在则创建默认用户"""
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute("SELECT uid FROM userinfo WHERE uid = %s", (uid,))
                 result = cursor.fetchone()
                 
@@ -114,79 +967,278 @@ class DatabaseManager:
         except Exception as e:
             print(f"检查用户失败: {e}")
     
-    def anime_exists(self, title, source):
-        """检查动漫是否已存在"""
+    def anime_exists(self, title, source, bgm_id=None):
+        """检查动漫是否已存在，先查进程内索引，未命中时查询数据库
+        
+        有条目ID时按ID查找，未找到时只匹配还没有条目ID的同名动漫（与 _save_anime 的规则一致）；没有条目ID时按规范化标题查找
+        """
+        aid = self._lookup_title_index(title, source, bgm_id)
+        if aid:
+            return aid
+        
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT aid FROM animesinfo WHERE (acn_name = %s OR ajp_name = %s) AND source = %s", 
-                              (title, title, source))
-                result = cursor.fetchone()
-                return result['aid'] if result else None
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                return self._find_anime(cursor, title, source, bgm_id)
         except Exception as e:
             print(f"检查动漫存在失败: {e}")
             return None
     
+    def _find_anime(self, cursor, title, source, bgm_id=None):
+        """在给定游标上查找动漫ID，供已持有连接的方法复用，找到时记入进程内索引
+        
+        有条目ID时按标题只匹配没有条目ID的记录，不会返回同名的其他条目
+        """
+        if bgm_id:
+            cursor.execute("SELECT aid FROM animesinfo WHERE source = %s AND bgm_id = %s", (source, bgm_id))
+            result = cursor.fetchone()
+            if result:
+                self._remember_anime(result['aid'], source, bgm_id=bgm_id)
+                return result['aid']
+        
+        key = normalize_title(title)
+        if not key:
+            return None
+        # 两个分支分别使用 (source, cn_key) 和 (source, jp_key) 索引
+        without_bgm = " AND bgm_id IS NULL" if bgm_id else ""
+        cursor.execute(f"""
+            SELECT aid FROM animesinfo WHERE source = %s AND cn_key = %s{without_bgm} 
+            UNION ALL 
+            SELECT aid FROM animesinfo WHERE source = %s AND jp_key = %s{without_bgm} 
+            LIMIT 1
+        """, (source, key, source, key))
+        result = cursor.fetchone()
+        if not result:
+            return None
+        self._remember_anime(result['aid'], source, keys=(key,))
+        return result['aid']
+    
+    def _lookup_title_index(self, title, source, bgm_id=None):
+        """在进程内索引中查找动漫ID，未找到时返回None
+        
+        标题索引不区分记录是否有条目ID，有条目ID时只查ID索引，未命中的交给 _find_anime 按规则查询数据库
+        """
+        with self.index_lock:
+            if bgm_id:
+                return self.bgm_index.get((source, str(bgm_id)))
+            key = normalize_title(title)
+            if key:
+                return self.title_index.get((key, source))
+        return None
+    
+    def _remember_anime(self, aid, source, keys=(), bgm_id=None):
+        """把已存在的动漫记入进程内索引"""
+        with self.index_lock:
+            for key in keys:
+                if key:
+                    self.title_index.setdefault((key, source), aid)
+            if bgm_id:
+                self.bgm_index[(source, str(bgm_id))] = aid
+    
+    def _remember_row(self, aid, row):
+        """按 animesinfo 的一行（_anime_row 的结果）记入进程内索引"""
+        self._remember_anime(aid, row[5], keys=(row[10], row[11]), bgm_id=row[8])
+    
+    def warm_title_index(self):
+        """把所有动漫的键读入进程内索引，返回条数
+        
+        需要扫描整张表，应在后台线程调用；索引只缓存已存在的动漫，预热完成前未命中的检查照常查询数据库
+        """
+        count = 0
+        try:
+            with self.pool.connection() as conn, self._streaming_cursor(conn) as cursor:
+                cursor.execute("SELECT aid, source, cn_key, jp_key, bgm_id FROM animesinfo")
+                for row in cursor:
+                    self._remember_anime(row['aid'], row['source'], keys=(row['cn_key'], row['jp_key']),
+                                         bgm_id=row['bgm_id'])
+                    count += 1
+        except Exception as e:
+            print(f"加载动漫索引失败: {e}")
+        return count
+    
+    def clear_title_index(self):
+        """清空进程内索引"""
+        with self.index_lock:
+            self.title_index.clear()
+            self.bgm_index.clear()
+    
+    def _merge_duplicate_rows(self, cursor):
+        """迁移v2：合并 (source, ajp_name) 相同的动漫（保留最早的aid，分类记录改指向它），再删除重复的分类记录
+        
+        分组和比较都在数据库中进行，与唯一键使用相同的排序规则（MySQL默认不区分大小写）
+        """
+        cursor.execute("""
+            SELECT MIN(aid) AS aid, source, ajp_name FROM animesinfo 
+            WHERE source IS NOT NULL AND ajp_name IS NOT NULL 
+            GROUP BY source, ajp_name HAVING COUNT(*) > 1
+        """)
+        merged = 0
+        for group in cursor.fetchall():
+            cursor.execute("SELECT aid FROM animesinfo WHERE source = %s AND ajp_name = %s AND aid <> %s",
+                           (group['source'], group['ajp_name'], group['aid']))
+            duplicates = [row['aid'] for row in cursor.fetchall()]
+            if not duplicates:
+                continue
+            placeholders = ", ".join(["%s"] * len(duplicates))
+            cursor.execute(f"UPDATE recordinfo SET aid = %s WHERE aid IN ({placeholders})", [group['aid']] + duplicates)
+            cursor.execute(f"DELETE FROM animesinfo WHERE aid IN ({placeholders})", duplicates)
+            merged += len(duplicates)
+        
+        cursor.execute("""
+            SELECT MIN(rid) AS rid, uid, aid, state FROM recordinfo 
+            GROUP BY uid, aid, state HAVING COUNT(*) > 1
+        """)
+        removed = 0
+        for group in cursor.fetchall():
+            cursor.execute("DELETE FROM recordinfo WHERE uid = %s AND aid = %s AND state = %s AND rid <> %s",
+                           (group['uid'], group['aid'], group['state'], group['rid']))
+            removed += cursor.rowcount
+        print(f"已合并 {merged} 条重复的动漫，删除 {removed} 条重复的分类记录")
+    
+    def _backfill_title_keys(self, cursor):
+        """迁移v4：为已有的动漫计算规范化标题键"""
+        cursor.execute("SELECT aid, acn_name, ajp_name FROM animesinfo WHERE cn_key IS NULL OR jp_key IS NULL")
+        rows = [(normalize_title(row['acn_name']), normalize_title(row['ajp_name']), row['aid'])
+                for row in cursor.fetchall()]
+        if rows:
+            cursor.executemany("UPDATE animesinfo SET cn_key = %s, jp_key = %s WHERE aid = %s", rows)
+        print(f"已计算 {len(rows)} 条动漫的标题键")
+    
+    def _cache_get(self, key):
+        """读取查询缓存，返回 (结果, 当前版本号)，未命中时结果为None"""
+        with self.cache_lock:
+            return self.query_cache.get(key), self.cache_generation
+    
+    def _cache_set(self, key, result, generation):
+        """保存查询结果；查询期间缓存已失效时不保存，避免写入旧数据"""
+        with self.cache_lock:
+            if generation == self.cache_generation:
+                self.query_cache[key] = result
+    
+    def invalidate_cache(self, uid=None, state=None):
+        """使分类查询缓存失效，不指定uid/state时清空全部"""
+        with self.cache_lock:
+            self.cache_generation += 1
+            if uid is None:
+                self.query_cache.clear()
+                return
+            for key in list(self.query_cache):
+                if key[1] == uid and (state is None or key[2] == state):
+                    del self.query_cache[key]
+    
+    def _anime_row(self, anime_info):
+        """把动漫信息转换为 animesinfo 表的一行"""
+        # 解析开播时间
+        broadcast_time = None
+        if 'air_date' in anime_info and anime_info['air_date']:
+            try:
+                broadcast_time = datetime.strptime(anime_info['air_date'], '%Y-%m-%d')
+            except:
+                pass
+        
+        # 解析集数
+        episodes = None
+        if 'episodes' in anime_info and anime_info['episodes']:
+            try:
+                # 从字符串中提取数字
+                episodes_str = anime_info['episodes']
+                episodes_match = re.search(r'(\d+)', episodes_str)
+                if episodes_match:
+                    episodes = int(episodes_match.group(1))
+            except:
+                pass
+        
+        # 解析评分
+        score = None
+        if 'rating' in anime_info and anime_info['rating']:
+            try:
+                score = float(anime_info['rating'])
+            except:
+                pass
+        
+        # Bangumi条目ID
+        bgm_id = None
+        if anime_info['source'] == 'Bangumi' and str(anime_info.get('id') or '').isdigit():
+            bgm_id = int(anime_info['id'])
+        
+        # 中文名不能为NULL（分类列表按 (acn_name, aid) 游标分页），没有时使用原名
+        name_cn = anime_info.get('name_cn', anime_info['title'])
+        if name_cn is None:
+            name_cn = anime_info['title'] or ''
+        
+        return (
+            name_cn,
+            anime_info['title'],
+            broadcast_time,
+            episodes,
+            score,
+            anime_info['source'],
+            anime_info.get('summary', ''),
+            anime_info.get('cover_url', ''),
+            bgm_id,
+            json.dumps(anime_info['images']) if anime_info.get('images') else None,
+            normalize_title(name_cn),
+            normalize_title(anime_info['title'])
+        )
+    
+    @abstractmethod
+    def _upsert_anime(self, cursor, row):
+        """插入动漫，已存在（按唯一键 source + bgm_id，没有条目ID时按 source + ajp_name）时直接返回已有的aid"""
+    
+    def _save_anime(self, cursor, row):
+        """保存动漫并返回aid，已存在时复用已有的aid
+        
+        有条目ID时按ID判断（同名的不同条目不会被合并），未找到时认领旧版本保存的没有条目ID的同名记录；
+        没有条目ID时按规范化标题判断，全角半角、大小写不同的写法视为同一部
+        """
+        source, bgm_id = row[5], row[8]
+        if bgm_id:
+            aid = self._lookup_title_index(None, source, bgm_id)
+            if not aid:
+                aid = self._find_anime(cursor, row[1], source, bgm_id) or self._find_anime(cursor, row[0], source, bgm_id)
+                if aid:
+                    self._claim_anime(cursor, aid, bgm_id)
+        else:
+            aid = (self._lookup_title_index(row[1], source)
+                   or self._lookup_title_index(row[0], source)
+                   or self._find_anime(cursor, row[1], source)
+                   or self._find_anime(cursor, row[0], source))
+        if aid:
+            return aid
+        return self._upsert_anime(cursor, row)
+    
+    def _claim_anime(self, cursor, aid, bgm_id):
+        """为没有条目ID的记录补上条目ID（已有ID的不变），之后按ID即可找到"""
+        cursor.execute("UPDATE animesinfo SET bgm_id = %s WHERE aid = %s AND bgm_id IS NULL", (bgm_id, aid))
+    
+    def _is_saved_as(self, cursor, aid, row):
+        """确认aid对应的记录就是这一行的条目（有条目ID时比较ID），确认后才能记入进程内索引"""
+        bgm_id = row[8]
+        if not bgm_id:
+            return True
+        cursor.execute("SELECT bgm_id FROM animesinfo WHERE aid = %s", (aid,))
+        result = cursor.fetchone()
+        if result and result['bgm_id'] == bgm_id:
+            return True
+        print(f"动漫 {row[1]}（条目ID {bgm_id}）对应的记录 {aid} 条目ID不同，不记入索引")
+        return False
+    
+    @abstractmethod
+    def _upsert_record(self, cursor, uid, aid, state):
+        """插入分类记录，已存在（按唯一键 uid + aid + state）时直接返回已有的rid"""
+    
     def insert_anime(self, anime_info):
         """插入动漫信息到数据库"""
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                # 检查是否已存在
-                existing_aid = self.anime_exists(anime_info['title'], anime_info['source'])
-                
-                if existing_aid:
-                    print(f"动漫已存在，ID: {existing_aid}")
-                    return existing_aid
-                
-                # 解析开播时间
-                broadcast_time = None
-                if 'air_date' in anime_info and anime_info['air_date']:
-                    try:
-                        broadcast_time = datetime.strptime(anime_info['air_date'], '%Y-%m-%d')
-                    except:
-                        pass
-                
-                # 解析集数
-                episodes = None
-                if 'episodes' in anime_info and anime_info['episodes']:
-                    try:
-                        # 从字符串中提取数字
-                        episodes_str = anime_info['episodes']
-                        episodes_match = re.search(r'(\d+)', episodes_str)
-                        if episodes_match:
-                            episodes = int(episodes_match.group(1))
-                    except:
-                        pass
-                
-                # 解析评分
-                score = None
-                if 'rating' in anime_info and anime_info['rating']:
-                    try:
-                        score = float(anime_info['rating'])
-                    except:
-                        pass
-                
-                # 插入动漫信息
-                sql = """
-                    INSERT INTO animesinfo 
-                    (acn_name, ajp_name, abroadcast_time, episodes, score, source, introduce, cover_url) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql, (
-                    anime_info.get('name_cn', anime_info['title']),
-                    anime_info['title'],
-                    broadcast_time,
-                    episodes,
-                    score,
-                    anime_info['source'],
-                    anime_info.get('summary', ''),
-                    anime_info.get('cover_url', '')
-                ))
-                
-                aid = cursor.lastrowid
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                row = self._anime_row(anime_info)
+                conn.begin()
+                aid = self._save_anime(cursor, row)
+                verified = self._is_saved_as(cursor, aid, row)
                 conn.commit()
-                print(f"动漫信息插入成功，ID: {aid}")
+                if verified:
+                    self._remember_row(aid, row)
+                self.invalidate_cache()
+                print(f"动漫信息已保存，ID: {aid}")
                 return aid
                 
         except Exception as e:
@@ -196,39 +1248,46 @@ class DatabaseManager:
     def add_to_category(self, aid, uid, state):
         """添加动漫到用户分类"""
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                # 检查是否已存在相同记录
-                cursor.execute("""
-                    SELECT rid FROM recordinfo 
-                    WHERE uid = %s AND aid = %s AND state = %s
-                """, (uid, aid, state))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    print(f"记录已存在，RID: {existing['rid']}")
-                    return existing['rid']
-                
-                # 插入新记录
-                cursor.execute("""
-                    INSERT INTO recordinfo (uid, aid, state) 
-                    VALUES (%s, %s, %s)
-                """, (uid, aid, state))
-                
-                rid = cursor.lastrowid
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                rid = self._upsert_record(cursor, uid, aid, state)
                 conn.commit()
-                print(f"分类记录插入成功，RID: {rid}")
+                self.invalidate_cache(uid, state)
+                print(f"分类记录已保存，RID: {rid}")
                 return rid
                 
         except Exception as e:
             print(f"添加分类失败: {e}")
             return None
     
+    def add_anime_to_category(self, anime_info, uid, state):
+        """在同一个事务中保存动漫信息并添加到用户分类，返回 (aid, rid)，失败时返回None"""
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                row = self._anime_row(anime_info)
+                conn.begin()
+                aid = self._save_anime(cursor, row)
+                verified = self._is_saved_as(cursor, aid, row)
+                rid = self._upsert_record(cursor, uid, aid, state)
+                conn.commit()
+                if verified:
+                    self._remember_row(aid, row)
+                self.invalidate_cache(uid, state)
+                print(f"已添加到分类，ID: {aid}，RID: {rid}")
+                return aid, rid
+                
+        except Exception as e:
+            print(f"添加到分类失败: {e}")
+            return None
+    
     def get_animes_by_state(self, uid, state):
-        """根据状态获取用户的动漫列表"""
+        """根据状态获取用户的动漫列表（结果会被缓存，调用方不应修改）"""
+        key = ('all', uid, state)
+        cached, generation = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 sql = """
                     SELECT a.*, r.rid, r.state 
                     FROM animesinfo a 
@@ -237,39 +1296,689 @@ class DatabaseManager:
                     ORDER BY a.acn_name
                 """
                 cursor.execute(sql, (uid, state))
-                return cursor.fetchall()
+                animes = cursor.fetchall()
         except Exception as e:
             print(f"获取分类动漫失败: {e}")
             return []
+        
+        self._cache_set(key, animes, generation)
+        return animes
+    
+    # 分类网格只需要这些列，不读取简介等大字段
+    GRID_COLUMNS = "a.aid, a.acn_name, a.ajp_name, a.abroadcast_time, a.episodes, a.score, a.cover_url, a.cover_images, r.rid, r.state"
+    
+    def get_animes_page(self, uid, state, limit=40, offset=0):
+        """分页获取用户某个分类的动漫（LIMIT/OFFSET）"""
+        key = ('page', uid, state, limit, offset)
+        cached, generation = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                sql = f"""
+                    SELECT {self.GRID_COLUMNS} 
+                    FROM animesinfo a 
+                    INNER JOIN recordinfo r ON a.aid = r.aid 
+                    WHERE r.uid = %s AND r.state = %s 
+                    ORDER BY a.acn_name, a.aid 
+                    LIMIT %s OFFSET %s
+                """
+                cursor.execute(sql, (uid, state, limit, offset))
+                animes = cursor.fetchall()
+        except Exception as e:
+            print(f"获取分类动漫失败: {e}")
+            return []
+        
+        self._cache_set(key, animes, generation)
+        return animes
+    
+    def get_animes_after(self, uid, state, after=None, limit=40):
+        """按游标获取下一页：after为上一页最后一行的 (acn_name, aid)，为None时从头开始"""
+        key = ('after', uid, state, after, limit)
+        cached, generation = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                sql = f"""
+                    SELECT {self.GRID_COLUMNS} 
+                    FROM animesinfo a 
+                    INNER JOIN recordinfo r ON a.aid = r.aid 
+                    WHERE r.uid = %s AND r.state = %s 
+                """
+                params = [uid, state]
+                if after is not None:
+                    # 从上一页的最后一行继续，不需要像OFFSET那样扫描前面所有行；
+                    # 行值比较可以直接使用 (acn_name, aid) 索引做范围查找
+                    sql += " AND (a.acn_name, a.aid) > (%s, %s)"
+                    params.extend([after[0], after[1]])
+                sql += " ORDER BY a.acn_name, a.aid LIMIT %s"
+                params.append(limit)
+                
+                cursor.execute(sql, params)
+                animes = cursor.fetchall()
+        except Exception as e:
+            print(f"获取分类动漫失败: {e}")
+            return []
+        
+        self._cache_set(key, animes, generation)
+        return animes
     
     def get_anime_by_id(self, aid):
         """根据ID获取动漫信息"""
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute("SELECT * FROM animesinfo WHERE aid = %s", (aid,))
                 return cursor.fetchone()
         except Exception as e:
             print(f"获取动漫信息失败: {e}")
             return None
+    
+    # 批量导入时重复行的处理方式，由子类按数据库语法提供
+    IGNORE_DUPLICATE_ANIME = ""
+    IGNORE_DUPLICATE_RECORD = ""
+    
+    def import_animes(self, anime_infos, uid, state, chunk_size=500):
+        """批量导入动漫到用户分类，每chunk_size条一个事务，返回导入的条数"""
+        imported = 0
+        chunk = []
+        for anime_info in anime_infos:
+            chunk.append(anime_info)
+            if len(chunk) >= chunk_size:
+                imported += self._import_chunk(chunk, uid, state)
+                chunk = []
+        if chunk:
+            imported += self._import_chunk(chunk, uid, state)
+        return imported
+    
+    def _import_chunk(self, anime_infos, uid, state):
+        """在一个事务中导入一批动漫"""
+        rows = [self._anime_row(anime_info) for anime_info in anime_infos]
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            # 先查找已存在的动漫（与 _save_anime 一致：有条目ID的按ID，没有的按规范化标题），
+            # 全角半角、大小写不同的写法不会再插入一行
+            aids = self._find_animes(cursor, rows)
+            new_rows = []
+            claimed = set()
+            for row, aid in zip(rows, aids):
+                if aid is not None:
+                    continue
+                if not row[8]:
+                    # 同一批中规范化标题相同的只插入第一条
+                    keys = {(row[5], key) for key in (row[11], row[10]) if key}
+                    if keys & claimed:
+                        continue
+                    claimed |= keys
+                new_rows.append(row)
+            
+            if new_rows:
+                cursor.executemany(f"{self.ANIME_INSERT} {self.IGNORE_DUPLICATE_ANIME}", new_rows)
+                # 取回新插入的aid；被其他唯一键忽略的行同样按条目ID或规范化标题查找
+                pending = [i for i, aid in enumerate(aids) if aid is None]
+                for i, aid in zip(pending, self._find_animes(cursor, [rows[i] for i in pending])):
+                    aids[i] = aid
+            
+            found = []
+            for row, aid in zip(rows, aids):
+                if aid is None:
+                    print(f"导入时未找到动漫 {row[1]} 的记录，跳过")
+                else:
+                    found.append((row, aid))
+            
+            # 去重并保持原有顺序
+            records = list(dict.fromkeys((uid, aid, state) for _, aid in found))
+            if records:
+                cursor.executemany(f"""
+                    INSERT INTO recordinfo (uid, aid, state) 
+                    VALUES (%s, %s, %s)
+                    {self.IGNORE_DUPLICATE_RECORD}
+                """, records)
+            conn.commit()
+        
+        for row, aid in found:
+            self._remember_row(aid, row)
+        self.invalidate_cache(uid, state)
+        print(f"已导入 {len(found)} 条")
+        return len(found)
+    
+    def _find_animes(self, cursor, rows):
+        """批量版的 _find_anime：按 animesinfo 的行查找已有的aid，返回与rows一一对应的列表，未找到的为None
+        
+        规则与 _save_anime 相同：有条目ID的行按ID查找，未找到时认领没有条目ID的同名记录（补上ID）；
+        没有条目ID的按规范化原名、中文名查找
+        """
+        by_bgm = {}
+        by_key = {}
+        without_bgm = {}
+        for source in {row[5] for row in rows}:
+            bgm_ids = list({row[8] for row in rows if row[5] == source and row[8]})
+            if bgm_ids:
+                placeholders = ", ".join(["%s"] * len(bgm_ids))
+                cursor.execute(f"SELECT aid, bgm_id FROM animesinfo WHERE source = %s AND bgm_id IN ({placeholders})",
+                               [source] + bgm_ids)
+                for result in cursor.fetchall():
+                    by_bgm[(source, result['bgm_id'])] = result['aid']
+            
+            keys = list({key for row in rows if row[5] == source for key in (row[11], row[10]) if key})
+            if keys:
+                # 两个分支分别使用 (source, cn_key) 和 (source, jp_key) 索引
+                placeholders = ", ".join(["%s"] * len(keys))
+                cursor.execute(f"""
+                    SELECT aid, bgm_id, cn_key AS title_key FROM animesinfo WHERE source = %s AND cn_key IN ({placeholders}) 
+                    UNION ALL 
+                    SELECT aid, bgm_id, jp_key AS title_key FROM animesinfo WHERE source = %s AND jp_key IN ({placeholders})
+                """, [source] + keys + [source] + keys)
+                for result in cursor.fetchall():
+                    by_key.setdefault((source, result['title_key']), result['aid'])
+                    if result['bgm_id'] is None:
+                        without_bgm.setdefault((source, result['title_key']), result['aid'])
+        
+        aids = []
+        claimed = set()
+        for row in rows:
+            source, bgm_id = row[5], row[8]
+            if not bgm_id:
+                aids.append(by_key.get((source, row[11])) or by_key.get((source, row[10])))
+                continue
+            aid = by_bgm.get((source, bgm_id))
+            if aid is None:
+                aid = without_bgm.get((source, row[11])) or without_bgm.get((source, row[10]))
+                # 同一条记录只能被一个条目认领
+                if aid is not None and aid not in claimed:
+                    self._claim_anime(cursor, aid, bgm_id)
+                    claimed.add(aid)
+                    by_bgm[(source, bgm_id)] = aid
+                else:
+                    aid = None
+            aids.append(aid)
+        return aids
+    
+    def _streaming_cursor(self, conn):
+        """逐行读取结果的游标，避免一次性把整个结果集读入内存"""
+        return conn.cursor()
+    
+    def export_animes(self, uid, state=None):
+        """逐行导出用户的动漫列表，state为None时导出所有分类"""
+        sql = """
+            SELECT a.*, r.rid, r.state 
+            FROM animesinfo a 
+            INNER JOIN recordinfo r ON a.aid = r.aid 
+            WHERE r.uid = %s
+        """
+        params = [uid]
+        if state:
+            sql += " AND r.state = %s"
+            params.append(state)
+        sql += " ORDER BY r.rid"
+        
+        with self.pool.connection() as conn, self._streaming_cursor(conn) as cursor:
+            cursor.execute(sql, params)
+            for row in cursor:
+                yield row
+
+class MySQLDatabaseManager(DatabaseManager):
+    """MySQL后端（远程服务器）"""
+    DIALECT = 'mysql'
+    
+    def __init__(self, host='cn-hk-bgp-4.ofalias.net', port=39960, user='root', password='root',
+                 database='animes_db', **kwargs):
+        self.params = {
+            'host': host,
+            'port': port,
+            'user': user,
+            'password': password,
+            'database': database
+        }
+        super().__init__(**kwargs)
+    
+    def _create_connection(self):
+        """创建一个新的数据库连接"""
+        # 只读查询自动提交，不留下需要回滚的事务；写入时由 conn.begin() 显式开始事务
+        return pymysql.connect(charset='utf8mb4', cursorclass=DictCursor, autocommit=True, **self.params)
+    
+    def _check_connection(self, conn):
+        """ping(reconnect=True) 会自动修复断开的连接"""
+        conn.ping(reconnect=True)
+    
+    def _in_transaction(self, conn):
+        """服务器在每个响应中返回的状态标志"""
+        return bool(conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+    
+    def _is_duplicate_schema_error(self, error):
+        """1060: 列已存在，1061: 索引已存在，1091: 要删除的索引不存在"""
+        return isinstance(error, pymysql.MySQLError) and error.args and error.args[0] in (1060, 1061, 1091)
+    
+    # 以下两个方法依赖结构迁移 v2/v6 中的唯一键
+    # LAST_INSERT_ID(expr) 使重复时 lastrowid 返回已有记录的ID，无需再查询一次
+    def _upsert_anime(self, cursor, row):
+        cursor.execute(f"{self.ANIME_INSERT} ON DUPLICATE KEY UPDATE aid = LAST_INSERT_ID(aid)", row)
+        return cursor.lastrowid
+    
+    def _upsert_record(self, cursor, uid, aid, state):
+        cursor.execute("""
+            INSERT INTO recordinfo (uid, aid, state) 
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE rid = LAST_INSERT_ID(rid)
+        """, (uid, aid, state))
+        return cursor.lastrowid
+    
+    # executemany会把带 ON DUPLICATE KEY 的语句合并为一条多行INSERT
+    IGNORE_DUPLICATE_ANIME = "ON DUPLICATE KEY UPDATE aid = aid"
+    IGNORE_DUPLICATE_RECORD = "ON DUPLICATE KEY UPDATE rid = rid"
+    
+    def _streaming_cursor(self, conn):
+        """服务端游标，结果逐行从服务器读取"""
+        return conn.cursor(SSDictCursor)
+
+
+# SQLite中日期时间按 "YYYY-MM-DD HH:MM:SS" 保存，读取时转换回datetime
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SQLiteCursor:
+    """让sqlite3游标的用法与pymysql的DictCursor一致（%s占位符、字典行、with语句）"""
+    def __init__(self, cursor):
+        self.cursor = cursor
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.cursor.close()
+    
+    def __iter__(self):
+        return (self._to_dict(row) for row in self.cursor)
+    
+    def _to_dict(self, row):
+        return {column[0]: value for column, value in zip(self.cursor.description, row)}
+    
+    def execute(self, sql, params=()):
+        return self.cursor.execute(sql.replace('%s', '?'), params)
+    
+    def executemany(self, sql, seq_of_params):
+        return self.cursor.executemany(sql.replace('%s', '?'), seq_of_params)
+    
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return self._to_dict(row) if row is not None else None
+    
+    def fetchall(self):
+        return [self._to_dict(row) for row in self.cursor.fetchall()]
+    
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+    
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+
+class SQLiteConnection:
+    """sqlite3连接的包装，提供与pymysql连接相同的cursor/commit/rollback接口"""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+    
+    def cursor(self):
+        return SQLiteCursor(self.conn.cursor())
+    
+    def commit(self):
+        self.conn.commit()
+    
+    def rollback(self):
+        self.conn.rollback()
+    
+    def begin(self):
+        """显式开始事务，使之后的读取和写入处于同一事务（sqlite3默认只在第一条写语句前开始）"""
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+    
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+    
+    def close(self):
+        self.conn.close()
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """SQLite后端（本地嵌入式数据库，WAL模式），适合单用户使用和离线测试"""
+    DIALECT = 'sqlite'
+    
+    def __init__(self, path=SQLITE_DB_PATH, **kwargs):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__(**kwargs)
+    
+    def _create_connection(self):
+        """创建一个新的数据库连接"""
+        return SQLiteConnection(self.path)
+    
+    def _check_connection(self, conn):
+        """执行一条简单查询确认连接可用"""
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    
+    def _in_transaction(self, conn):
+        """sqlite3只在写语句前自动开始事务，只读查询之后不需要回滚"""
+        return conn.in_transaction
+    
+    def _is_duplicate_schema_error(self, error):
+        """ADD COLUMN 时列已存在"""
+        return isinstance(error, sqlite3.OperationalError) and 'duplicate column name' in str(error)
+    
+    # 冲突时做一次无实际变化的更新，使 RETURNING 也能返回已有记录的ID；
+    # 不指定冲突目标，任一唯一键 (source, bgm_id) / 没有条目ID时的 (source, ajp_name) 冲突都会命中
+    def _upsert_anime(self, cursor, row):
+        cursor.execute(f"{self.ANIME_INSERT} ON CONFLICT DO UPDATE SET ajp_name = ajp_name RETURNING aid", row)
+        return cursor.fetchone()['aid']
+    
+    def _upsert_record(self, cursor, uid, aid, state):
+        cursor.execute("""
+            INSERT INTO recordinfo (uid, aid, state) 
+            VALUES (%s, %s, %s)
+            ON CONFLICT (uid, aid, state) DO UPDATE SET state = excluded.state
+            RETURNING rid
+        """, (uid, aid, state))
+        return cursor.fetchone()['rid']
+    
+    IGNORE_DUPLICATE_ANIME = "ON CONFLICT DO NOTHING"
+    IGNORE_DUPLICATE_RECORD = "ON CONFLICT DO NOTHING"
+
+
+def create_database_manager(backend=None):
+    """根据配置创建数据库管理器"""
+    backend = backend or DB_BACKEND
+    if backend == 'mysql':
+        return MySQLDatabaseManager()
+    if backend == 'sqlite':
+        return SQLiteDatabaseManager()
+    raise ValueError(f"未知的数据库后端: {backend}")
+
+
+class AsyncDatabase:
+    """数据库异步访问门面：在后台线程执行数据库调用，结果通过 root.after 回到界面线程"""
+    def __init__(self, db, root, max_workers=2):
+        self.db = db
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+    
+    def submit(self, method, *args, on_success=None, on_error=None, **kwargs):
+        """在后台执行 db.<method>(*args, **kwargs)，返回 Future
+        
+        回调在界面线程中执行；结果送达前调用 future.cancel() 即可丢弃结果，回调不会执行
+        """
+        future = Future()
+        self.executor.submit(self._run, future, getattr(self.db, method), args, kwargs, on_success, on_error)
+        return future
+    
+    def __getattr__(self, name):
+        """db_async.get_anime_by_id(aid, on_success=...) 等价于 submit('get_anime_by_id', aid, ...)"""
+        if name.startswith('_') or not callable(getattr(self.db, name, None)):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.submit(name, *args, **kwargs)
+    
+    def _run(self, future, func, args, kwargs, on_success, on_error):
+        """后台线程：执行数据库调用，然后把结果交给界面线程"""
+        if future.cancelled():
+            return
+        try:
+            result, error = func(*args, **kwargs), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            self.root.after(0, self._deliver, future, result, error, on_success, on_error)
+        except Exception as e:
+            # 窗口已关闭
+            print(f"数据库结果无法送达界面: {e}")
+    
+    def _deliver(self, future, result, error, on_success, on_error):
+        """界面线程：设置 Future 结果并执行回调，已取消的直接丢弃"""
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+            if on_error:
+                on_error(error)
+            else:
+                print(f"数据库操作失败: {error}")
+            return
+        future.set_result(result)
+        if on_success:
+            on_success(result)
+    
+    def shutdown(self):
+        """关闭后台线程"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SearchController:
+    """搜索控制器：每次搜索分配新的代号并取消旧搜索，只有最新一次搜索的结果会被显示"""
+    def __init__(self, root, search, on_results, on_error, on_finish=None, debounce_ms=SEARCH_DEBOUNCE_MS):
+        self.root = root
+        self.search = search          # search(query, cancel_event, publish) -> results，在后台线程执行，
+                                      # 可先调用 publish(results) 显示阶段性结果
+        self.on_results = on_results  # 以下回调都在界面线程中执行，且只针对最新一次搜索
+        self.on_error = on_error
+        self.on_finish = on_finish
+        self.debounce_ms = debounce_ms
+        
+        self.generation = 0
+        self.cancel_event = None
+        self.running_query = None
+        self.after_id = None
+    
+    def submit(self, query):
+        """立即搜索，同一关键词正在搜索时不重复发起；返回本次搜索的代号"""
+        self._cancel_timer()
+        if query == self.running_query:
+            return self.generation
+        
+        # 通知上一次搜索放弃剩余的请求
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        
+        self.generation += 1
+        self.cancel_event = threading.Event()
+        self.running_query = query
+        threading.Thread(target=self._run, args=(self.generation, query, self.cancel_event), daemon=True).start()
+        return self.generation
+    
+    def schedule(self, query):
+        """边输入边搜索：停止输入 debounce_ms 毫秒后才搜索"""
+        self._cancel_timer()
+        if query == self.running_query:
+            return
+        
+        # 关键词已经变化，进行中的搜索结果不会再被显示，立即取消
+        if self.running_query is not None:
+            self.cancel()
+        self.after_id = self.root.after(self.debounce_ms, self.submit, query)
+    
+    def cancel(self):
+        """取消等待中和进行中的搜索，之后不会再有回调"""
+        self._cancel_timer()
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+        self.running_query = None
+        self.generation += 1
+    
+    def _cancel_timer(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+    
+    def _run(self, generation, query, cancel_event):
+        """后台线程：执行搜索，把结果连同代号交给界面线程"""
+        def publish(results):
+            if not cancel_event.is_set():
+                self.root.after(0, self._deliver_partial, generation, results)
+        
+        try:
+            results, error = self.search(query, cancel_event, publish), None
+        except SearchCancelled:
+            return
+        except Exception as e:
+            results, error = None, e
+        
+        if cancel_event.is_set():
+            return
+        try:
+            self.root.after(0, self._deliver, generation, results, error)
+        except Exception as e:
+            # 窗口已关闭
+            print(f"搜索结果无法送达界面: {e}")
+    
+    def _deliver_partial(self, generation, results):
+        """界面线程：显示阶段性结果，搜索仍在进行"""
+        if generation == self.generation:
+            self.on_results(results)
+    
+    def _deliver(self, generation, results, error):
+        """界面线程：丢弃过期搜索的结果"""
+        if generation != self.generation:
+            return
+        
+        self.running_query = None
+        self.cancel_event = None
+        if error is not None:
+            self.on_error(error)
+        else:
+            self.on_results(results)
+        if self.on_finish:
+            self.on_finish()
+
+
+class RenderScheduler:
+    """增量渲染调度器：通过 root.after 分批创建控件，每帧超出时间预算后让出事件循环"""
+    def __init__(self, root, frame_budget_ms=RENDER_FRAME_BUDGET_MS, first_batch=6, batch_size=None):
+        self.root = root
+        self.frame_budget = frame_budget_ms / 1000
+        self.first_batch = first_batch  # 第一屏同步渲染的数量
+        self.batch_size = batch_size    # 每帧最多渲染的数量（None 表示只按时间预算）
+        self.job = None
+        self.after_id = None
+    
+    def schedule(self, items, render, on_done=None):
+        """开始渲染一组项目，会取消尚未完成的上一组"""
+        self.cancel()
+        job = {'items': deque(items), 'render': render, 'on_done': on_done}
+        self.job = job
+        
+        # 第一屏立即显示，其余分帧渲染
+        self._render_batch(job, self.first_batch, None)
+        self._continue(job)
+    
+    def cancel(self):
+        """取消尚未完成的渲染"""
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+        self.job = None
+    
+    def pending(self):
+        """是否还有未渲染的项目"""
+        return self.job is not None
+    
+    def _render_batch(self, job, limit, deadline):
+        """渲染一批项目，达到数量上限或超过截止时间即停止"""
+        count = 0
+        while job['items'] and job is self.job:
+            if limit is not None and count >= limit:
+                break
+            if deadline is not None and count > 0 and time.perf_counter() >= deadline:
+                break
+            item = job['items'].popleft()
+            try:
+                job['render'](item)
+            except Exception as e:
+                print(f"渲染失败: {e}")
+            count += 1
+    
+    def _run_slice(self, job):
+        """一帧的渲染"""
+        self.after_id = None
+        if job is not self.job:
+            return
+        
+        self._render_batch(job, self.batch_size, time.perf_counter() + self.frame_budget)
+        self._continue(job)
+    
+    def _continue(self, job):
+        """还有剩余时安排下一帧，否则结束"""
+        if job is not self.job:
+            return
+        if job['items']:
+            # 延迟1毫秒，让事件循环先处理绘制和输入事件
+            self.after_id = self.root.after(1, self._run_slice, job)
+            return
+        
+        self.job = None
+        if job['on_done']:
+            job['on_done']()
+
 
 class AnimeInfoDownloaderGUI:
-    def __init__(self):
+    # 分类列表每页加载的数量（每行4个）
+    CATEGORY_PAGE_SIZE = 40
+    
+    # 分类列表虚拟网格：行高固定，只为可见行及上下缓冲行创建控件，滚动时循环复用
+    CATEGORY_COLUMNS = 4
+    CATEGORY_ROW_HEIGHT = 320
+    CATEGORY_BUFFER_ROWS = 1
+    
+    # 各视图的封面尺寸，按尺寸选择下载的封面版本
+    CATEGORY_COVER_SIZE = (120, 160)
+    RESULT_COVER_SIZE = (100, 140)
+    DETAIL_COVER_SIZE = (200, 280)
+    
+    def __init__(self, backend=None):
         self.root = tk.Tk()
         self.root.title("动漫信息下载器 - 数据库版")
         self.root.geometry("1280x720")
         self.root.configure(bg="#f0f0f0")
         
         # 初始化图片缓存
-        self.image_cache = ImageCache(max_size=50)
+        self.image_cache = ImageCache(max_bytes=64 * 1024 * 1024)
         
-        # 初始化数据库管理器
-        self.db = DatabaseManager()
-        self.db.check_user_exists(1)  # 使用默认用户ID=1
+        # 初始化数据库管理器（后端由命令行 --backend 指定，默认读取 ANIMES_DB_BACKEND）
+        self.db = create_database_manager(backend)
+        
+        # 界面中的数据库操作都通过异步门面在后台线程执行
+        self.db_async = AsyncDatabase(self.db, self.root)
+        self.db_async.check_user_exists(1)  # 使用默认用户ID=1
+        self.db_async.warm_title_index(on_success=lambda count: print(f"已加载 {count} 部动漫到进程内索引"))
+        self.category_request = None  # 分类列表正在加载的页
+        self.detail_request = None    # 正在加载的分类动漫详情
         
         # 初始化下载器
         self.downloader = AnimeInfoDownloader()
         
+        # 在后台把数据库中已有的动漫收录到本地搜索索引
+        self.downloader.executor.submit(self._index_database_animes)
+        
+        # 搜索控制器，保证只显示最新一次搜索的结果
+        self.search_controller = SearchController(
+            self.root, self._perform_search,
+            on_results=self._on_search_results,
+            on_error=lambda e: self._show_error(f"搜索失败: {str(e)}"),
+            on_finish=self._search_complete
+        )
+        
+        # 增量渲染调度器（搜索结果和分类列表各一个）
+        self.search_renderer = RenderScheduler(self.root)
+        self.category_renderer = RenderScheduler(self.root, first_batch=2 * self.CATEGORY_COLUMNS)
+        
         # 存储搜索结果
         self.search_results = []
         
@@ -317,6 +2026,14 @@ class AnimeInfoDownloaderGUI:
     def clear_current_page(self):
         """清除当前页面"""
         if self.current_page:
+            # 停止往即将销毁的页面中渲染，丢弃该页面尚未返回的查询和搜索
+            self.search_controller.cancel()
+            self.search_renderer.cancel()
+            self.category_renderer.cancel()
+            self._cancel_category_request()
+            if self.detail_request:
+                self.detail_request.cancel()
+                self.detail_request = None
             for widget in self.main_container.winfo_children():
                 widget.destroy()
     
@@ -334,6 +2051,8 @@ class AnimeInfoDownloaderGUI:
         self.search_entry = ttk.Entry(search_frame, width=40)
         self.search_entry.grid(row=0, column=1, sticky=tk.W+tk.E, padx=(0, 10))
         self.search_entry.bind("<Return>", lambda e: self.search_anime())
+        if self.search_controller.debounce_ms > 0:
+            self.search_entry.bind("<KeyRelease>", self._on_search_typed)
         
         self.search_button = ttk.Button(search_frame, text="搜索", command=self.search_anime)
         self.search_button.grid(row=0, column=2, padx=(0, 10))
@@ -377,11 +2096,6 @@ class AnimeInfoDownloaderGUI:
         self.current_page = "watching"
         self.page_history.append("watching")
         
-        # 预加载追番列表的图片
-        animes = self.db.get_animes_by_state(1, "watching")
-        cover_urls = [anime.get('cover_url') for anime in animes if anime.get('cover_url')]
-        self.image_cache.preload(cover_urls)
-        
         self._show_category_list("追番中", "watching")
     
     def show_finished_list(self):
@@ -390,11 +2104,6 @@ class AnimeInfoDownloaderGUI:
         self.current_page = "finished"
         self.page_history.append("finished")
         
-        # 预加载已完成列表的图片
-        animes = self.db.get_animes_by_state(1, "finished")
-        cover_urls = [anime.get('cover_url') for anime in animes if anime.get('cover_url')]
-        self.image_cache.preload(cover_urls)
-        
         self._show_category_list("看完了", "finished")
     
     def show_anime_detail(self, anime_info, from_page="home"):
@@ -404,9 +2113,15 @@ class AnimeInfoDownloaderGUI:
         self.page_history.append("detail")
         self.current_anime_detail = anime_info
         
+        # 搜索结果只有列表卡片的信息，在后台获取完整条目后刷新详情
+        if anime_info.get('detail_level') == 'card':
+            future = self.downloader.executor.submit(self.downloader.load_full_details, anime_info)
+            future.add_done_callback(lambda f: self._on_full_details_loaded(anime_info, from_page, f))
+        
         # 预加载详情页的大图
-        if anime_info.get('cover_url'):
-            self.image_cache.preload([anime_info['cover_url']])
+        cover_url = select_cover_url(anime_info, self.DETAIL_COVER_SIZE)
+        if cover_url:
+            self.image_cache.preload([cover_url])
         
         # 顶部导航栏
         nav_frame = ttk.Frame(self.main_container)
@@ -441,18 +2156,55 @@ class AnimeInfoDownloaderGUI:
         scrollable_frame.bind("<MouseWheel>", lambda e: canvas.yview_scroll(int(-1*(e.delta/120)), "units"))
         
         # 显示详细信息
+        self.detail_frame = scrollable_frame
         self._populate_detail_frame(scrollable_frame, anime_info, from_page)
     
+    def _on_full_details_loaded(self, anime_info, from_page, future):
+        """完整条目信息获取完成（后台线程）"""
+        try:
+            full_info = future.result()
+        except Exception as e:
+            print(f"获取完整条目信息失败: {e}")
+            return
+        self.root.after(0, self._update_anime_detail, anime_info, full_info, from_page)
+    
+    def _update_anime_detail(self, anime_info, full_info, from_page):
+        """用完整条目信息刷新详情页"""
+        # 保存到原来的字典中，之后添加到分类时使用完整信息
+        anime_info.update(full_info)
+        
+        # 已离开该详情页时不刷新
+        if self.current_page != "detail" or self.current_anime_detail is not anime_info:
+            return
+        
+        for widget in self.detail_frame.winfo_children():
+            widget.destroy()
+        self._populate_detail_frame(self.detail_frame, anime_info, from_page)
+    
     def show_category_anime_detail(self, aid):
         """显示分类中动漫的详细信息"""
-        # 从数据库获取动漫详情
-        anime = self.db.get_anime_by_id(aid)
+        # 在后台从数据库获取动漫详情，重复点击时只保留最后一次
+        if self.detail_request:
+            self.detail_request.cancel()
+        self.detail_request = self.db_async.get_anime_by_id(
+            aid,
+            on_success=self._on_category_anime_loaded,
+            on_error=lambda e: messagebox.showerror("错误", f"加载动漫详情失败: {e}")
+        )
+    
+    def _on_category_anime_loaded(self, anime):
+        """分类中动漫的详细信息加载完成"""
+        self.detail_request = None
         if not anime:
             messagebox.showerror("错误", "找不到动漫的详细信息")
             return
         
-        # 转换为统一的格式
-        anime_info = {
+        self.show_anime_detail(self._anime_info_from_row(anime), self.current_page)
+    
+    @staticmethod
+    def _anime_info_from_row(anime):
+        """把数据库中的动漫转换为统一的格式"""
+        return {
             'title': anime['ajp_name'],
             'name_cn': anime['acn_name'],
             'air_date': anime['abroadcast_time'].strftime('%Y-%m-%d') if anime['abroadcast_time'] else '',
@@ -461,11 +2213,11 @@ class AnimeInfoDownloaderGUI:
             'rating': str(anime['score']) if anime['score'] else '无评分',
             'summary': anime['introduce'],
             'cover_url': anime['cover_url'],
+            'images': json.loads(anime['cover_images']) if anime.get('cover_images') else {},
             'source': anime['source'],
-            'id': anime['aid']
+            'id': anime.get('bgm_id'),
+            'aid': anime['aid']
         }
-        
-        self.show_anime_detail(anime_info, self.current_page)
     
     def go_back(self):
         """返回上一页"""
@@ -506,8 +2258,21 @@ class AnimeInfoDownloaderGUI:
             lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
         )
         
-        canvas.create_window((0, 0), window=self.category_scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        self.category_canvas = canvas
+        self.category_window = canvas.create_window((0, 0), window=self.category_scrollable_frame, anchor="nw")
+        
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # 显示滚动后进入可见区域的行
+            self._update_visible_category_rows()
+            # 滚动到接近底部时加载下一页
+            if float(last) > 0.9:
+                self._load_next_category_page()
+        
+        canvas.configure(yscrollcommand=on_scroll)
+        
+        # 网格宽度跟随画布宽度，高度变化时可见行数也会变化
+        canvas.bind("<Configure>", self._on_category_canvas_configure)
         
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -520,79 +2285,188 @@ class AnimeInfoDownloaderGUI:
         self._populate_category_list(state)
     
     def _populate_category_list(self, state):
-        """填充分类列表 - 使用流式排版（网格布局）"""
-        # 从数据库获取分类列表
-        animes = self.db.get_animes_by_state(1, state)  # 使用默认用户ID=1
+        """填充分类列表 - 虚拟网格布局，滚动时分页加载"""
+        self.category_state = state
+        self.category_cursor = None      # 已加载的最后一行 (acn_name, aid)
+        self.category_animes = []        # 已加载的动漫
+        self.category_exhausted = False  # 是否已加载完所有页
+        self.category_slots = {}         # 序号 -> 正在显示的槽位
+        self.category_spare_slots = []   # 离开可见区域、等待复用的槽位
+        self.category_visible = range(0) # 当前可见（含缓冲行）的序号范围
+        self.category_renderer.cancel()
+        self._cancel_category_request()
+        
+        self._load_next_category_page()
+    
+    def _cancel_category_request(self):
+        """丢弃分类列表尚未返回的页"""
+        if self.category_request:
+            self.category_request.cancel()
+            self.category_request = None
+    
+    def _load_next_category_page(self):
+        """加载分类列表的下一页"""
+        # 已加载完或上一页还在后台查询中
+        if self.category_exhausted or self.category_request:
+            return
+        
+        # 在后台从数据库获取下一页
+        self.category_request = self.db_async.get_animes_after(
+            1, self.category_state, self.category_cursor,  # 使用默认用户ID=1
+            limit=self.CATEGORY_PAGE_SIZE,
+            on_success=self._on_category_page_loaded,
+            on_error=self._on_category_page_failed
+        )
+    
+    def _on_category_page_failed(self, error):
+        """分类列表的一页加载失败"""
+        self.category_request = None
+        print(f"加载分类列表失败: {error}")
+    
+    def _on_category_page_loaded(self, animes):
+        """分类列表的一页加载完成"""
+        self.category_request = None
+        if len(animes) < self.CATEGORY_PAGE_SIZE:
+            self.category_exhausted = True
         
         if not animes:
-            ttk.Label(self.category_scrollable_frame, text="该分类中还没有动漫", foreground="gray").pack(pady=20)
+            if not self.category_animes:
+                self.category_scrollable_frame.configure(height=60)
+                ttk.Label(self.category_scrollable_frame, text="该分类中还没有动漫", foreground="gray").place(x=10, y=20)
             return
         
-        # 使用网格布局显示动漫
-        row = 0
-        col = 0
-        max_cols = 4  # 每行最多显示4个
+        self.category_cursor = (animes[-1]['acn_name'], animes[-1]['aid'])
+        self.category_animes.extend(animes)
         
-        for anime in animes:
-            # 创建项目框架
-            item_frame = ttk.Frame(self.category_scrollable_frame, relief="solid", borderwidth=1)
-            item_frame.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
-            
-            # 配置网格权重，使项目均匀分布
-            self.category_scrollable_frame.grid_columnconfigure(col, weight=1)
-            self.category_scrollable_frame.grid_rowconfigure(row, weight=1)
-            
-            # 封面图片
-            cover_frame = ttk.Frame(item_frame)
-            cover_frame.pack(padx=5, pady=5)
-            
-            # 加载封面图片
-            self._load_category_cover_image(cover_frame, anime.get('cover_url', ''))
-            
-            # 标题
-            title_text = anime['ajp_name']
-            if anime['acn_name'] and anime['acn_name'] != anime['ajp_name']:
-                title_text = anime['acn_name']
-            
-            # 限制标题长度
-            if len(title_text) > 15:
-                title_text = title_text[:15] + "..."
-            
-            title_label = ttk.Label(item_frame, text=title_text, font=("Arial", 10, "bold"), wraplength=150)
-            title_label.pack(pady=(0, 2))
-            
-            # 详细信息框架
-            info_frame = ttk.Frame(item_frame)
-            info_frame.pack(fill=tk.X, padx=5, pady=2)
-            
-            # 年份
-            year = str(anime['abroadcast_time'].year) if anime['abroadcast_time'] else '未知年份'
-            year_label = ttk.Label(info_frame, text=f"📅 {year}", font=("Arial", 8))
-            year_label.pack(anchor=tk.W)
-            
-            # 集数
-            episodes = anime['episodes'] if anime['episodes'] else '集数未知'
-            episodes_label = ttk.Label(info_frame, text=f"🎞️ {episodes}", font=("Arial", 8))
-            episodes_label.pack(anchor=tk.W)
-            
-            # 评分
-            rating = anime['score'] if anime['score'] else '无评分'
-            rating_label = ttk.Label(info_frame, text=f"⭐ {rating}", font=("Arial", 8))
-            rating_label.pack(anchor=tk.W)
-            
-            # 查看详情按钮
-            detail_button = ttk.Button(item_frame, text="查看详情", 
-                                      command=lambda aid=anime['aid']: self.show_category_anime_detail(aid))
-            detail_button.pack(pady=5)
-            
-            # 添加悬停效果
-            self._add_hover_effect(item_frame)
-            
-            # 更新网格位置
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        # 预加载这一页的图片
+        cover_urls = [select_cover_url(anime, self.CATEGORY_COVER_SIZE) for anime in animes]
+        self.image_cache.preload(cover_urls)
+        
+        # 网格高度按已加载的行数计算，子控件使用place布局不会撑开框架
+        rows = math.ceil(len(self.category_animes) / self.CATEGORY_COLUMNS)
+        self.category_scrollable_frame.configure(height=rows * self.CATEGORY_ROW_HEIGHT)
+        self._update_visible_category_rows()
+    
+    def _on_category_canvas_configure(self, event):
+        """画布大小变化"""
+        self.category_canvas.itemconfigure(self.category_window, width=event.width)
+        self._update_visible_category_rows()
+    
+    def _update_visible_category_rows(self):
+        """只为可见行显示槽位，离开可见区域的槽位回收复用"""
+        canvas = self.category_canvas
+        top = canvas.canvasy(0)
+        first_row = max(int(top // self.CATEGORY_ROW_HEIGHT) - self.CATEGORY_BUFFER_ROWS, 0)
+        last_row = int((top + canvas.winfo_height()) // self.CATEGORY_ROW_HEIGHT) + self.CATEGORY_BUFFER_ROWS
+        visible = range(first_row * self.CATEGORY_COLUMNS,
+                        min((last_row + 1) * self.CATEGORY_COLUMNS, len(self.category_animes)))
+        self.category_visible = visible
+        
+        # 回收离开可见区域的槽位
+        for index in list(self.category_slots):
+            if index not in visible:
+                slot = self.category_slots.pop(index)
+                slot['frame'].place_forget()
+                self.category_spare_slots.append(slot)
+        
+        # 为新进入可见区域的动漫绑定槽位（分帧进行，快速滚动时不阻塞界面）
+        missing = [index for index in visible if index not in self.category_slots]
+        if missing:
+            self.category_renderer.schedule(missing, self._show_category_slot)
+    
+    def _show_category_slot(self, index):
+        """为一个可见序号绑定并摆放槽位"""
+        # 渲染前已滚出可见区域或已显示时跳过
+        if index not in self.category_visible or index in self.category_slots:
+            return
+        
+        if self.category_spare_slots:
+            slot = self.category_spare_slots.pop()
+        else:
+            slot = self._create_category_slot()
+        self._bind_category_slot(slot, self.category_animes[index])
+        self.category_slots[index] = slot
+        
+        row, col = divmod(index, self.CATEGORY_COLUMNS)
+        slot['frame'].place(relx=col / self.CATEGORY_COLUMNS, x=5, y=row * self.CATEGORY_ROW_HEIGHT + 5,
+                            relwidth=1 / self.CATEGORY_COLUMNS, width=-10, height=self.CATEGORY_ROW_HEIGHT - 10)
+    
+    def _create_category_slot(self):
+        """创建分类网格中的一个槽位（控件只创建一次，之后反复绑定不同的动漫）"""
+        # 创建项目框架
+        item_frame = ttk.Frame(self.category_scrollable_frame, relief="solid", borderwidth=1)
+        
+        # 封面图片（固定大小，占位文字和图片共用同一个标签）
+        cover_frame = tk.Frame(item_frame, width=120, height=160, bg="lightgray")
+        cover_frame.pack_propagate(False)
+        cover_frame.pack(padx=5, pady=5)
+        cover_label = tk.Label(cover_frame, text="无封面", bg="lightgray")
+        cover_label.pack(fill=tk.BOTH, expand=True)
+        
+        # 标题
+        title_label = ttk.Label(item_frame, font=("Arial", 10, "bold"), wraplength=150)
+        title_label.pack(pady=(0, 2))
+        
+        # 详细信息框架
+        info_frame = ttk.Frame(item_frame)
+        info_frame.pack(fill=tk.X, padx=5, pady=2)
+        
+        year_label = ttk.Label(info_frame, font=("Arial", 8))
+        year_label.pack(anchor=tk.W)
+        
+        episodes_label = ttk.Label(info_frame, font=("Arial", 8))
+        episodes_label.pack(anchor=tk.W)
+        
+        rating_label = ttk.Label(info_frame, font=("Arial", 8))
+        rating_label.pack(anchor=tk.W)
+        
+        # 查看详情按钮
+        detail_button = ttk.Button(item_frame, text="查看详情")
+        detail_button.pack(pady=5)
+        
+        # 添加悬停效果
+        self._add_hover_effect(item_frame)
+        
+        return {
+            'frame': item_frame,
+            'cover': cover_label,
+            'cover_url': None,
+            'title': title_label,
+            'year': year_label,
+            'episodes': episodes_label,
+            'rating': rating_label,
+            'button': detail_button
+        }
+    
+    def _bind_category_slot(self, slot, anime):
+        """在槽位中显示一部动漫"""
+        # 标题
+        title_text = anime['ajp_name']
+        if anime['acn_name'] and anime['acn_name'] != anime['ajp_name']:
+            title_text = anime['acn_name']
+        
+        # 限制标题长度
+        if len(title_text) > 15:
+            title_text = title_text[:15] + "..."
+        slot['title'].configure(text=title_text)
+        
+        # 年份
+        year = str(anime['abroadcast_time'].year) if anime['abroadcast_time'] else '未知年份'
+        slot['year'].configure(text=f"📅 {year}")
+        
+        # 集数
+        episodes = anime['episodes'] if anime['episodes'] else '集数未知'
+        slot['episodes'].configure(text=f"🎞️ {episodes}")
+        
+        # 评分
+        rating = anime['score'] if anime['score'] else '无评分'
+        slot['rating'].configure(text=f"⭐ {rating}")
+        
+        # 查看详情按钮
+        slot['button'].configure(command=lambda aid=anime['aid']: self.show_category_anime_detail(aid))
+        
+        # 加载封面图片
+        self._load_category_cover_image(slot, select_cover_url(anime, self.CATEGORY_COVER_SIZE))
     
     def _add_hover_effect(self, widget):
         """添加鼠标悬停效果"""
@@ -605,59 +2479,50 @@ class AnimeInfoDownloaderGUI:
         widget.bind("<Enter>", on_enter)
         widget.bind("<Leave>", on_leave)
     
-    def _load_category_cover_image(self, parent_frame, cover_url):
+    def _load_category_cover_image(self, slot, cover_url):
         """加载分类列表中的封面图片"""
         # 默认显示占位图
-        placeholder = tk.Label(parent_frame, text="无封面", width=12, height=16, bg="lightgray")
-        placeholder.pack()
+        slot['cover_url'] = cover_url
+        slot['cover'].configure(image="", text="加载中..." if cover_url else "无封面", bg="lightgray")
+        slot['cover'].image = None
         
         # 如果封面URL存在，加载图片
         if cover_url:
-            # 在新线程中加载图片
-            threading.Thread(target=self._fetch_category_cover_image, 
-                           args=(parent_frame, placeholder, cover_url, (120, 160)), daemon=True).start()
+            # 交给共享下载线程池，可见封面优先
+            future = self.image_cache.request_thumbnail(
+                cover_url, self.CATEGORY_COVER_SIZE,
+                on_preview=lambda image: self._on_category_cover_preview(slot, cover_url, image))
+            future.add_done_callback(lambda f: self._on_category_cover_loaded(slot, cover_url, f))
     
-    def _fetch_category_cover_image(self, parent_frame, placeholder, cover_url, size):
-        """获取分类列表中的封面图片"""
+    def _on_category_cover_preview(self, slot, cover_url, image):
+        """分类列表中的封面下载途中先显示模糊预览"""
+        photo = ImageTk.PhotoImage(image)
+        self.root.after(0, self._update_category_cover_image, slot, cover_url, photo)
+    
+    def _on_category_cover_loaded(self, slot, cover_url, future):
+        """分类列表中的封面图片加载完成"""
         try:
-            # 首先检查缓存
-            cached_image = self.image_cache.get(cover_url)
+            photo = ImageTk.PhotoImage(future.result())
             
-            if cached_image:
-                # 使用缓存的图片
-                image = cached_image.copy()
-                image.thumbnail(size)
-                photo = ImageTk.PhotoImage(image)
-                
-                # 在主线程中更新UI
-                self.root.after(0, self._update_category_cover_image, parent_frame, placeholder, photo)
-            else:
-                # 从网络URL加载图片
-                response = requests.get(cover_url, timeout=10)
-                response.raise_for_status()
-                
-                image_data = response.content
-                image = Image.open(io.BytesIO(image_data))
-                
-                # 添加到缓存
-                self.image_cache.set(cover_url, image)
-                
-                # 调整大小并显示
-                image.thumbnail(size)
-                photo = ImageTk.PhotoImage(image)
-                
-                # 在主线程中更新UI
-                self.root.after(0, self._update_category_cover_image, parent_frame, placeholder, photo)
+            # 在主线程中更新UI
+            self.root.after(0, self._update_category_cover_image, slot, cover_url, photo)
         except Exception:
             # 如果加载失败，显示错误图标
-            self.root.after(0, lambda: placeholder.config(text="加载失败", bg="red"))
+            self.root.after(0, self._update_category_cover_image, slot, cover_url, None)
     
-    def _update_category_cover_image(self, parent_frame, placeholder, photo):
+    def _update_category_cover_image(self, slot, cover_url, photo):
         """更新分类列表中的封面图片"""
-        placeholder.destroy()
-        image_label = tk.Label(parent_frame, image=photo)
-        image_label.image = photo  # 保持引用
-        image_label.pack()
+        # 加载期间槽位已被复用给其他动漫时忽略
+        if slot['cover_url'] != cover_url:
+            return
+        
+        if photo is None:
+            slot['cover'].configure(image="", text="加载失败", bg="red")
+            slot['cover'].image = None
+            return
+        
+        slot['cover'].configure(image=photo, text="")
+        slot['cover'].image = photo  # 保持引用
     
     def _populate_detail_frame(self, parent, anime_info, from_page):
         """填充详情框架"""
@@ -670,7 +2535,7 @@ class AnimeInfoDownloaderGUI:
         left_frame.pack(side=tk.LEFT, padx=(0, 20))
         
         # 加载大封面图片
-        self._load_large_cover_image(left_frame, anime_info, (200, 280))
+        self._load_large_cover_image(left_frame, anime_info, self.DETAIL_COVER_SIZE)
         
         # 右侧 - 标题和基本信息
         right_frame = ttk.Frame(top_frame)
@@ -764,43 +2629,20 @@ class AnimeInfoDownloaderGUI:
         placeholder = tk.Label(parent_frame, text="加载中...", width=20, height=28, bg="lightgray")
         placeholder.pack()
         
-        # 在新线程中加载大图
-        threading.Thread(target=self._fetch_large_cover_image, 
-                        args=(parent_frame, placeholder, anime_info, size), daemon=True).start()
+        # 交给共享下载线程池，可见封面优先
+        cover_url = select_cover_url(anime_info, size)
+        if cover_url:
+            future = self.image_cache.request_thumbnail(
+                cover_url, size,
+                on_preview=lambda image: self._on_cover_preview(placeholder, image))
+            future.add_done_callback(lambda f: self._on_large_cover_loaded(parent_frame, placeholder, f))
     
-    def _fetch_large_cover_image(self, parent_frame, placeholder, anime_info, size):
+    def _on_large_cover_loaded(self, parent_frame, placeholder, future):
         try:
-            if 'cover_url' in anime_info and anime_info['cover_url']:
-                cover_url = anime_info['cover_url']
-                
-                # 首先检查缓存
-                cached_image = self.image_cache.get(cover_url)
-                
-                if cached_image:
-                    # 使用缓存的图片
-                    image = cached_image.copy()
-                    image.thumbnail(size)
-                    photo = ImageTk.PhotoImage(image)
-                    
-                    # 在主线程中更新UI
-                    self.root.after(0, self._update_large_cover_image, parent_frame, placeholder, photo)
-                else:
-                    # 从网络URL加载图片
-                    response = requests.get(cover_url, timeout=10)
-                    response.raise_for_status()
-                    
-                    image_data = response.content
-                    image = Image.open(io.BytesIO(image_data))
-                    
-                    # 添加到缓存
-                    self.image_cache.set(cover_url, image)
-                    
-                    # 调整大小
-                    image.thumbnail(size)
-                    photo = ImageTk.PhotoImage(image)
-                    
-                    # 在主线程中更新UI
-                    self.root.after(0, self._update_large_cover_image, parent_frame, placeholder, photo)
+            photo = ImageTk.PhotoImage(future.result())
+            
+            # 在主线程中更新UI
+            self.root.after(0, self._update_large_cover_image, parent_frame, placeholder, photo)
         except Exception:
             # 如果加载失败，显示错误图标
             self.root.after(0, lambda: placeholder.config(text="加载失败", bg="red"))
@@ -867,20 +2709,38 @@ class AnimeInfoDownloaderGUI:
         self.results_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
     
     
-    def _perform_search(self, anime_name):
+    def _index_database_animes(self):
+        """把数据库中的动漫收录到本地搜索索引（后台线程）"""
         try:
-            self.search_results = self.downloader.search_anime(anime_name, max_results=10)
-            
-            # 预加载搜索结果的图片
-            cover_urls = [anime.get('cover_url') for anime in self.search_results if anime.get('cover_url')]
-            self.image_cache.preload(cover_urls)
-            
-            # 在主线程中更新UI
-            self.root.after(0, self._update_search_results)
+            batch = []
+            for row in self.db.export_animes(1):  # 使用默认用户ID=1
+                batch.append(self._anime_info_from_row(row))
+                if len(batch) >= 500:
+                    self.downloader.index_subjects(batch)
+                    batch = []
+            self.downloader.index_subjects(batch)
         except Exception as e:
-            self.root.after(0, lambda: self._show_error(f"搜索失败: {str(e)}"))
-        finally:
-            self.root.after(0, self._search_complete)
+            print(f"收录数据库动漫到本地搜索索引失败: {e}")
+    
+    def _perform_search(self, anime_name, cancel, publish):
+        """在后台线程中搜索，先通过publish显示本地索引的结果，cancel被设置时放弃剩余的请求"""
+        def show_local(results):
+            self._preload_result_covers(results)
+            publish(results)
+        
+        results = self.downloader.search_anime(anime_name, max_results=10, cancel=cancel, on_local=show_local)
+        self._preload_result_covers(results)
+        return results
+    
+    def _preload_result_covers(self, results):
+        """预加载搜索结果的图片"""
+        cover_urls = [select_cover_url(anime, self.RESULT_COVER_SIZE) for anime in results]
+        self.image_cache.preload(cover_urls)
+    
+    def _on_search_results(self, results):
+        """最新一次搜索完成"""
+        self.search_results = results
+        self._update_search_results()
     
     def _search_complete(self):
         self.search_button.config(state="normal")
@@ -891,7 +2751,8 @@ class AnimeInfoDownloaderGUI:
         self.status_var.set("搜索失败")
     
     def _update_search_results(self):
-        # 清除之前的搜索结果
+        # 停止渲染上一次的结果，并清除之前的搜索结果
+        self.search_renderer.cancel()
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
         
@@ -902,9 +2763,11 @@ class AnimeInfoDownloaderGUI:
         
         self.status_var.set(f"找到 {len(self.search_results)} 个结果")
         
-        # 显示搜索结果
-        for i, anime_info in enumerate(self.search_results):
-            self._create_result_widget(anime_info, i)
+        # 显示搜索结果（第一屏立即显示，其余分帧渲染）
+        self.search_renderer.schedule(
+            list(enumerate(self.search_results)),
+            lambda item: self._create_result_widget(item[1], item[0])
+        )
     
     def _create_result_widget(self, anime_info, index):
         # 创建结果框架
@@ -916,7 +2779,7 @@ class AnimeInfoDownloaderGUI:
         left_frame.pack(side=tk.LEFT, padx=5, pady=5)
         
         # 加载封面图片
-        self._load_cover_image(left_frame, anime_info, (100, 140))
+        self._load_cover_image(left_frame, anime_info, self.RESULT_COVER_SIZE)
         
         # 右半部分 - 信息
         right_frame = ttk.Frame(result_frame)
@@ -982,43 +2845,20 @@ class AnimeInfoDownloaderGUI:
         placeholder = tk.Label(parent_frame, text="加载中...", width=15, height=20, bg="lightgray")
         placeholder.pack()
         
-        # 在新线程中加载图片
-        threading.Thread(target=self._fetch_cover_image, 
-                        args=(parent_frame, placeholder, anime_info, size), daemon=True).start()
+        # 交给共享下载线程池，可见封面优先
+        cover_url = select_cover_url(anime_info, size)
+        if cover_url:
+            future = self.image_cache.request_thumbnail(
+                cover_url, size,
+                on_preview=lambda image: self._on_cover_preview(placeholder, image))
+            future.add_done_callback(lambda f: self._on_cover_loaded(parent_frame, placeholder, f))
     
-    def _fetch_cover_image(self, parent_frame, placeholder, anime_info, size):
+    def _on_cover_loaded(self, parent_frame, placeholder, future):
         try:
-            if 'cover_url' in anime_info and anime_info['cover_url']:
-                cover_url = anime_info['cover_url']
-                
-                # 首先检查缓存
-                cached_image = self.image_cache.get(cover_url)
-                
-                if cached_image:
-                    # 使用缓存的图片
-                    image = cached_image.copy()
-                    image.thumbnail(size)
-                    photo = ImageTk.PhotoImage(image)
-                    
-                    # 在主线程中更新UI
-                    self.root.after(0, self._update_cover_image, parent_frame, placeholder, photo)
-                else:
-                    # 从网络URL加载图片
-                    response = requests.get(cover_url, timeout=10)
-                    response.raise_for_status()
-                    
-                    # 转换图片
-                    image_data = response.content
-                    image = Image.open(io.BytesIO(image_data))
-                    
-                    # 添加到缓存
-                    self.image_cache.set(cover_url, image)
-                    
-                    image.thumbnail(size)
-                    photo = ImageTk.PhotoImage(image)
-                    
-                    # 在主线程中更新UI
-                    self.root.after(0, self._update_cover_image, parent_frame, placeholder, photo)
+            photo = ImageTk.PhotoImage(future.result())
+            
+            # 在主线程中更新UI
+            self.root.after(0, self._update_cover_image, parent_frame, placeholder, photo)
         except Exception:
             # 如果加载失败，显示错误图标
             self.root.after(0, lambda: placeholder.config(text="加载失败", bg="red"))
@@ -1029,6 +2869,19 @@ class AnimeInfoDownloaderGUI:
         image_label.image = photo  # 保持引用
         image_label.pack()
     
+    def _on_cover_preview(self, placeholder, image):
+        """封面下载途中先在占位图中显示模糊预览"""
+        photo = ImageTk.PhotoImage(image)
+        self.root.after(0, self._show_cover_preview, placeholder, photo)
+    
+    def _show_cover_preview(self, placeholder, photo):
+        # 完整图片已显示（占位图已销毁）时忽略
+        if not placeholder.winfo_exists():
+            return
+        # 显示图片时宽高以像素为单位
+        placeholder.configure(image=photo, text="", width=photo.width(), height=photo.height())
+        placeholder.image = photo  # 保持引用
+    
     def _show_anime_details(self, index):
         """显示动漫详情"""
         if 0 <= index < len(self.search_results):
@@ -1057,23 +2910,24 @@ class AnimeInfoDownloaderGUI:
     
     def _add_to_category(self, anime_info, state, category_name):
         """添加到指定分类"""
-        try:
-            self.status_var.set(f"正在添加到{category_name}: {anime_info['title']}")
-            
-            # 插入动漫信息到数据库
-            aid = self.db.insert_anime(anime_info)
-            if not aid:
-                raise Exception("无法保存动漫信息到数据库")
-            
-            # 添加到用户分类
-            rid = self.db.add_to_category(aid, 1, state)  # 使用默认用户ID=1
-            if not rid:
-                raise Exception("无法添加到分类")
-            
-            self.status_var.set(f"已添加到{category_name}: {anime_info['title']}")
-            messagebox.showinfo("成功", f"已成功添加到{category_name}列表")
-        except Exception as e:
-            self.root.after(0, lambda: self._show_error(f"添加失败: {str(e)}"))
+        self.status_var.set(f"正在添加到{category_name}: {anime_info['title']}")
+        
+        # 保存动漫信息并添加到用户分类（同一个事务），在后台执行
+        self.db_async.add_anime_to_category(
+            anime_info, 1, state,  # 使用默认用户ID=1
+            on_success=lambda result: self._on_added_to_category(result, anime_info, category_name),
+            on_error=lambda e: self._show_error(f"添加失败: {str(e)}")
+        )
+    
+    def _on_added_to_category(self, result, anime_info, category_name):
+        """添加到分类完成"""
+        if not result:
+            self._show_error("添加失败: 无法保存到数据库")
+            return
+        
+        self.status_var.set(f"已添加到{category_name}: {anime_info['title']}")
+        self.downloader.executor.submit(self.downloader.index_subjects, [anime_info])
+        messagebox.showinfo("成功", f"已成功添加到{category_name}列表")
     
     def search_anime(self):
         anime_name = self.search_entry.get().strip()
@@ -1081,68 +2935,484 @@ class AnimeInfoDownloaderGUI:
             messagebox.showwarning("输入错误", "请输入动漫名称")
             return
         
+        self._start_search(anime_name)
+    
+    def _start_search(self, anime_name, debounce=False):
+        """发起搜索，旧的搜索会被取消"""
         # 禁用搜索按钮并启动进度条
         self.search_button.config(state="disabled")
         self.progress.start()
         self.status_var.set(f"正在搜索: {anime_name}")
         
-        # 在新线程中执行搜索
-        threading.Thread(target=self._perform_search, args=(anime_name,), daemon=True).start()
+        # 在后台线程中执行搜索
+        if debounce:
+            self.search_controller.schedule(anime_name)
+        else:
+            self.search_controller.submit(anime_name)
+    
+    def _on_search_typed(self, event):
+        """边输入边搜索"""
+        # 回车由 search_anime 处理
+        if event.keysym == "Return":
+            return
+        
+        anime_name = self.search_entry.get().strip()
+        if len(anime_name) < 2:
+            # 关键词太短时不搜索，并取消之前的搜索
+            self.search_controller.cancel()
+            self._search_complete()
+            return
+        self._start_search(anime_name, debounce=True)
 
     
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.db_async.shutdown()
+
+
+class ResponseCache:
+    """接口响应缓存类（SQLite持久化，按接口和参数区分）"""
+    def __init__(self, db_path=None, ttl=6 * 3600):
+        if db_path is None:
+            db_path = os.path.join(CACHE_DIR, "responses.sqlite3")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        
+        # 命中统计
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(method, url, params=None):
+        """根据请求方法、地址和参数生成缓存键"""
+        return json.dumps([method, url, params or {}], sort_keys=True, ensure_ascii=False)
+    
+    def get(self, key):
+        """获取缓存条目，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'body': row[0], 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+    
+    def is_fresh(self, entry):
+        """判断缓存条目是否仍在有效期内"""
+        return time.time() - entry['fetched_at'] < self.ttl
+    
+    def store(self, key, body, etag=None, last_modified=None):
+        """保存响应内容"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, body, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, time.time())
+            )
+            self.conn.commit()
+    
+    def touch(self, key):
+        """服务器返回304时刷新缓存时间"""
+        with self.lock:
+            self.conn.execute("UPDATE responses SET fetched_at = ? WHERE cache_key = ?", (time.time(), key))
+            self.conn.commit()
+    
+    def record(self, kind):
+        """记录一次命中(hit)、重新验证(revalidation)或未命中(miss)"""
+        with self.lock:
+            if kind == 'hit':
+                self.hits += 1
+            elif kind == 'revalidation':
+                self.revalidations += 1
+            else:
+                self.misses += 1
+    
+    def stats(self):
+        """返回缓存统计信息"""
+        with self.lock:
+            return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses}
+
+
+class LocalSearchIndex:
+    """本地搜索索引（SQLite FTS5三字切分），收录搜索和详情中见过的条目以及数据库中的动漫，离线也能搜索"""
+    # 索引文本的格式版本（PRAGMA user_version），格式变化时重建已收录条目的索引文本
+    # 1: 名称、别名和简介按 normalize_title 规范化后索引
+    INDEX_VERSION = 1
+    
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(CACHE_DIR, "search_index.sqlite3")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS subjects (
+                subject_key TEXT PRIMARY KEY,
+                name_cn TEXT,
+                name TEXT,
+                aliases TEXT,
+                summary TEXT,
+                info TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        
+        # trigram分词不依赖空格，适合中日文；SQLite不支持时退回LIKE查询
+        try:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS subjects_fts USING fts5(
+                    subject_key UNINDEXED, name_cn, name, aliases, summary, tokenize='trigram'
+                )
+            """)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite不支持FTS5 trigram，本地搜索使用LIKE: {e}")
+            self.fts = False
+        self.conn.commit()
+        
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < self.INDEX_VERSION:
+            self._reindex()
+    
+    @staticmethod
+    def _index_columns(info):
+        """条目的索引文本 (中文名, 原名, 别名, 简介)，与查询使用同样的规范化，全角半角、大小写不同的写法都能命中"""
+        return (normalize_title(info.get('name_cn')), normalize_title(info.get('title')),
+                normalize_title(" ".join(info.get('aliases') or [])), normalize_title(info.get('summary')))
+    
+    def _write_index(self, key, columns):
+        """写入一个条目的全文索引"""
+        if self.fts:
+            self.conn.execute("DELETE FROM subjects_fts WHERE subject_key = ?", (key,))
+            self.conn.execute(
+                "INSERT INTO subjects_fts (subject_key, name_cn, name, aliases, summary) VALUES (?, ?, ?, ?, ?)",
+                (key, *columns)
+            )
+    
+    def _reindex(self):
+        """按当前格式重新生成所有已收录条目的索引文本"""
+        rows = self.conn.execute("SELECT subject_key, info FROM subjects").fetchall()
+        for key, info in rows:
+            columns = self._index_columns(json.loads(info))
+            self.conn.execute("UPDATE subjects SET name_cn = ?, name = ?, aliases = ?, summary = ? WHERE subject_key = ?",
+                              (*columns, key))
+            self._write_index(key, columns)
+        self.conn.execute(f"PRAGMA user_version = {self.INDEX_VERSION}")
+        self.conn.commit()
+        if rows:
+            print(f"已重建 {len(rows)} 个本地条目的搜索索引")
+    
+    @staticmethod
+    def subject_key(anime_info):
+        """条目的唯一键：有条目ID时按ID，否则按名称"""
+        source = anime_info.get('source') or 'Bangumi'
+        if anime_info.get('id'):
+            return f"{source}:{anime_info['id']}"
+        return f"{source}:{anime_info.get('title', '')}"
+    
+    def add(self, anime_info):
+        """收录一个条目"""
+        self.add_many([anime_info])
+    
+    def add_many(self, anime_infos):
+        """收录多个条目，已收录的条目合并新信息（完整信息不会被列表卡片信息降级）"""
+        with self.lock:
+            for anime_info in anime_infos:
+                if not anime_info or not anime_info.get('title'):
+                    continue
+                key = self.subject_key(anime_info)
+                row = self.conn.execute("SELECT info FROM subjects WHERE subject_key = ?", (key,)).fetchone()
+                info = dict(anime_info)
+                if row:
+                    old = json.loads(row[0])
+                    if old.get('detail_level') == 'full' and info.get('detail_level') != 'full':
+                        info['detail_level'] = 'full'
+                    info = {**old, **{k: v for k, v in info.items() if v not in (None, '')}}
+                
+                columns = self._index_columns(info)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO subjects (subject_key, name_cn, name, aliases, summary, info, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, *columns, json.dumps(info, ensure_ascii=False, default=str), time.time())
+                )
+                self._write_index(key, columns)
+            self.conn.commit()
+    
+    def search(self, query, limit=10):
+        """搜索本地条目，名称命中排在简介命中之前；关键词完整出现的排在前面，其次是部分三字片段相同的模糊结果"""
+        matched, fuzzy = self.search_parts(query, limit)
+        return (matched + fuzzy)[:limit]
+    
+    def search_parts(self, query, limit=10):
+        """搜索本地条目，返回 (关键词完整出现的结果, 名称或别名中只有部分三字片段相同的模糊结果)"""
+        # 与索引文本相同的规范化：全角半角统一、忽略大小写、忽略标点和空白
+        query = normalize_title(query.strip())
+        if not query:
+            return [], []
+        
+        with self.lock:
+            fuzzy_keys = []
+            if self.fts and len(query) >= 3:
+                keys = self._match(self._phrase(query), limit)
+                if len(keys) < limit and len(query) > 3:
+                    # 模糊匹配：任意一个三字片段相同即可，按命中的片段数排序；
+                    # 只比较名称和别名，简介很长，几乎总有片段相同，会带出无关的条目
+                    grams = {query[i:i + 3] for i in range(len(query) - 2)}
+                    fuzzy = " OR ".join(self._phrase(gram) for gram in grams)
+                    fuzzy_keys = [key for key in self._match(f"{{name_cn name aliases}} : ({fuzzy})", limit)
+                                  if key not in keys][:limit - len(keys)]
+            else:
+                # 不足三个字无法使用trigram索引，直接扫描（本地条目数量不大）
+                pattern = f"%{query}%"
+                keys = [row[0] for row in self.conn.execute("""
+                    SELECT subject_key FROM subjects 
+                    WHERE name_cn LIKE ? OR name LIKE ? OR aliases LIKE ? OR summary LIKE ? 
+                    ORDER BY (name_cn LIKE ? OR name LIKE ? OR aliases LIKE ?) DESC, updated_at DESC 
+                    LIMIT ?
+                """, (pattern, pattern, pattern, pattern, pattern, pattern, pattern, limit))]
+            
+            return self._load(keys[:limit]), self._load(fuzzy_keys)
+    
+    def _load(self, keys):
+        """按键读取条目信息，保持顺序"""
+        results = []
+        for key in keys:
+            row = self.conn.execute("SELECT info FROM subjects WHERE subject_key = ?", (key,)).fetchone()
+            if row:
+                results.append(json.loads(row[0]))
+        return results
+    
+    @staticmethod
+    def _phrase(text):
+        """转换为FTS5短语，避免关键词中的符号被当作查询语法"""
+        return '"' + text.replace('"', '""') + '"'
+    
+    def _match(self, match, limit):
+        """FTS5查询，名称的权重高于简介"""
+        return [row[0] for row in self.conn.execute("""
+            SELECT subject_key FROM subjects_fts 
+            WHERE subjects_fts MATCH ? 
+            ORDER BY bm25(subjects_fts, 0, 10.0, 10.0, 5.0, 1.0) 
+            LIMIT ?
+        """, (match, limit))]
+
+
+class SearchCancelled(Exception):
+    """搜索已被更新的搜索取代"""
 
 
 class AnimeInfoDownloader:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-
-    def search_bangumi(self, anime_name, max_results=5):
-        """使用Bangumi（番组计划）API搜索动漫详细信息"""
-        url = "https://api.bgm.tv/search/subject/" + quote(anime_name)
+    # 搜索列表只需要卡片上显示的字段（名称、封面、放送日期、集数、评分、简介）；
+    # 完整条目（含章节列表等）只在打开详情时获取
+    SEARCH_RESPONSE_GROUP = 'small'
+    DETAIL_RESPONSE_GROUP = 'large'
+    SUBJECT_CACHE_SIZE = 200
+    
+    # v0搜索接口每页的条数
+    V0_PAGE_SIZE = 20
+    
+    def __init__(self, max_workers=5, response_cache=None, search_backend=None, api_base=None, local_index=None):
+        if (search_backend or SEARCH_BACKEND) not in ('legacy', 'v0'):
+            raise ValueError(f"未知的搜索方式: {search_backend or SEARCH_BACKEND}")
+        self.search_backend = search_backend or SEARCH_BACKEND
+        self.api_base = (api_base or BANGUMI_API_BASE).rstrip("/")
+        self.session = create_http_session(pool_size=max_workers)
+        
+        # 详情请求线程池，限制同时向Bangumi发出的请求数
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bangumi")
+        
+        # 接口响应缓存
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        
+        # 本地搜索索引，收录所有获取过的条目
+        self.local_index = local_index if local_index is not None else LocalSearchIndex()
+        
+        # 完整条目信息的内存缓存（条目ID -> 信息），打开详情时才获取
+        self.subject_cache = OrderedDict()
+        self.subject_lock = threading.Lock()
+    
+    def _get_json(self, url, params=None):
+        """带缓存的GET请求：有效期内直接使用本地缓存，过期后发送条件请求"""
+        key = ResponseCache.make_key('GET', url, params)
+        entry = self.response_cache.get(key)
+        
+        if entry and self.response_cache.is_fresh(entry):
+            self.response_cache.record('hit')
+            return json.loads(entry['body'])
+        
+        # 缓存过期时带上ETag/Last-Modified，让服务器判断内容是否变化
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        response = self.session.get(url, params=params, headers=headers, timeout=10)
+        
+        if entry and response.status_code == 304:
+            self.response_cache.touch(key)
+            self.response_cache.record('revalidation')
+            return json.loads(entry['body'])
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        self.response_cache.store(key, response.content,
+                                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        self.response_cache.record('miss')
+        return data
+    
+    def _post_json(self, url, payload, params=None):
+        """带缓存的POST查询请求（搜索），有效期内直接使用本地缓存"""
+        key = ResponseCache.make_key('POST', url, {'params': params or {}, 'json': payload})
+        entry = self.response_cache.get(key)
+        
+        if entry and self.response_cache.is_fresh(entry):
+            self.response_cache.record('hit')
+            return json.loads(entry['body'])
+        
+        response = self.session.post(url, params=params, json=payload, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        
+        self.response_cache.store(key, response.content)
+        self.response_cache.record('miss')
+        return data
+
+    def search_bangumi(self, anime_name, max_results=5, cancel=None):
+        """使用Bangumi（番组计划）API搜索动漫，只返回列表卡片所需的信息；cancel（threading.Event）被设置时抛出SearchCancelled"""
+        url = f"{self.api_base}/search/subject/" + quote(anime_name)
         params = {
             'type': 2,  # 2表示动画
-            'responseGroup': 'large',
+            'responseGroup': self.SEARCH_RESPONSE_GROUP,
             'max_results': max_results
         }
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json(url, params)
+            self._check_cancelled(cancel)
             
-            results = []
             if data.get('list') and len(data['list']) > 0:
-                for item in data['list'][:max_results]:
-                    # 获取详细信息
-                    detail_url = f"https://api.bgm.tv/subject/{item['id']}"
-                    detail_response = self.session.get(detail_url, params=params, timeout=10)
-                    detail_response.raise_for_status()
-                    detail_data = detail_response.json()
-                    
-                    # 解析基本信息
-                    info = {
-                        'title': item.get('name', ''),
-                        'cover_url': item.get('images', {}).get('large', ''),
-                        'source': 'Bangumi',
-                        'id': item.get('id', '')
-                    }
-                    
-                    # 添加详细信息
-                    info.update(self._parse_bangumi_details(detail_data))
-                    results.append(info)
-                
-                return results
+                # 搜索结果本身已包含卡片字段，不再逐条请求详情
+                items = data['list'][:max_results]
+                return [self._parse_subject(item, 'card') for item in items]
                 
+        except SearchCancelled:
+            raise
         except Exception as e:
             print(f"Bangumi搜索失败: {e}")
         
         return []
     
+    def search_bangumi_v0(self, anime_name, max_results=5, cancel=None):
+        """使用Bangumi v0搜索接口，一次请求即返回评分、日期、简介、集数和封面，按页获取直到max_results条"""
+        url = f"{self.api_base}/v0/search/subjects"
+        payload = {
+            'keyword': anime_name,
+            'sort': 'match',
+            'filter': {'type': [2]}  # 2表示动画
+        }
+        
+        results = []
+        try:
+            while len(results) < max_results:
+                params = {'limit': min(self.V0_PAGE_SIZE, max_results - len(results)), 'offset': len(results)}
+                data = self._post_json(url, payload, params)
+                self._check_cancelled(cancel)
+                
+                items = data.get('data') or []
+                results.extend(self._parse_v0_subject(item) for item in items)
+                
+                # 最后一页
+                if len(items) < params['limit'] or len(results) >= (data.get('total') or 0):
+                    break
+        except SearchCancelled:
+            raise
+        except Exception as e:
+            print(f"Bangumi v0搜索失败: {e}")
+        
+        return results[:max_results]
+    
+    def _parse_v0_subject(self, item):
+        """把v0接口的条目转换为与旧接口相同的格式"""
+        data = dict(item)
+        
+        # v0的字段名与旧接口不同
+        if data.get('date') and not data.get('air_date'):
+            data['air_date'] = data['date']
+        if not data.get('eps_count'):
+            # eps为正片集数，total_episodes包含SP等
+            data['eps_count'] = data.get('eps') if isinstance(data.get('eps'), int) else data.get('total_episodes')
+        
+        # v0搜索结果已包含详情页的所有字段
+        return self._parse_subject(data, 'full')
+    
+    @staticmethod
+    def _check_cancelled(cancel):
+        """搜索已被取消时抛出SearchCancelled"""
+        if cancel is not None and cancel.is_set():
+            raise SearchCancelled()
+    
+    def get_subject(self, subject_id):
+        """根据Bangumi条目ID获取完整的动漫信息，格式与搜索结果相同，结果会被缓存"""
+        subject_id = str(subject_id)
+        with self.subject_lock:
+            if subject_id in self.subject_cache:
+                self.subject_cache.move_to_end(subject_id)
+                return self.subject_cache[subject_id]
+        
+        data = self._get_json(f"{self.api_base}/subject/{subject_id}",
+                              {'responseGroup': self.DETAIL_RESPONSE_GROUP})
+        data.setdefault('id', subject_id)
+        info = self._parse_subject(data, 'full')
+        self.index_subjects([info])
+        
+        with self.subject_lock:
+            self.subject_cache[subject_id] = info
+            while len(self.subject_cache) > self.SUBJECT_CACHE_SIZE:
+                self.subject_cache.popitem(last=False)
+        return info
+    
+    def load_full_details(self, anime_info):
+        """获取列表卡片对应的完整条目信息，已是完整信息或无法获取时原样返回"""
+        if anime_info.get('detail_level') == 'full':
+            return anime_info
+        if anime_info.get('source') != 'Bangumi' or not str(anime_info.get('id') or '').isdigit():
+            return anime_info
+        
+        info = dict(anime_info)
+        info.update(self.get_subject(anime_info['id']))
+        return info
+    
+    def _parse_subject(self, data, level):
+        """把Bangumi条目转换为统一的格式，level为 card（列表卡片）或 full（完整条目）"""
+        info = {
+            'title': data.get('name', ''),
+            'cover_url': (data.get('images') or {}).get('large', ''),
+            'images': data.get('images') or {},
+            'source': 'Bangumi',
+            'id': data.get('id', ''),
+            'detail_level': level
+        }
+        info.update(self._parse_bangumi_details(data))
+        return info
+    
     def _parse_bangumi_details(self, data):
         """解析Bangumi返回的详细信息"""
         details = {}
@@ -1169,6 +3439,18 @@ class AnimeInfoDownloader:
         else:
             details['rating'] = "无评分"
         
+        # 别名（infobox中的“别名”项）
+        aliases = []
+        for entry in data.get('infobox') or []:
+            if entry.get('key') == '别名':
+                value = entry.get('value')
+                if isinstance(value, list):
+                    aliases.extend(v['v'] for v in value if isinstance(v, dict) and v.get('v'))
+                elif value:
+                    aliases.append(str(value))
+        if aliases:
+            details['aliases'] = aliases
+        
         # 简介
         if data.get('summary'):
             # 清理简介中的HTML标签
@@ -1203,20 +3485,271 @@ class AnimeInfoDownloader:
         # 如果以上都没有，返回默认值
         return "集数未知"
     
-    def search_anime(self, anime_name, max_results=5):
-        """搜索动漫信息（仅使用Bangumi源）"""
+    def index_subjects(self, anime_infos):
+        """收录到本地搜索索引，失败不影响搜索"""
+        try:
+            self.local_index.add_many(anime_infos)
+        except Exception as e:
+            print(f"更新本地搜索索引失败: {e}")
+    
+    def search_local(self, anime_name, max_results=5):
+        """只搜索本地索引，返回 (关键词完整出现的结果, 模糊结果)"""
+        try:
+            return self.local_index.search_parts(anime_name, max_results)
+        except Exception as e:
+            print(f"本地搜索失败: {e}")
+            return [], []
+    
+    def search_anime(self, anime_name, max_results=5, cancel=None, on_local=None):
+        """搜索动漫信息（本地索引 + Bangumi），cancel被设置时放弃剩余的请求并抛出SearchCancelled
+        
+        提供on_local时先以本地结果调用on_local(results)，最终结果以本地结果在前、其余远程结果在后合并；
+        否则远程结果在前，本地独有的结果补在后面。本地的模糊结果总是排在远程结果之后
+        """
         print(f"正在搜索: {anime_name}")
         
+        local_results, local_fuzzy = self.search_local(anime_name, max_results)
+        if (local_results or local_fuzzy) and on_local:
+            on_local(local_results + local_fuzzy)
+        
         print(f"正在尝试 Bangumi...")
-        results = self.search_bangumi(anime_name, max_results)
+        if self.search_backend == 'v0':
+            results = self.search_bangumi_v0(anime_name, max_results, cancel)
+        else:
+            results = self.search_bangumi(anime_name, max_results, cancel)
         if results:
             print(f"✓ 在 Bangumi 找到 {len(results)} 个结果")
-            return results
+            self.index_subjects(results)
         else:
             print(f"✗ Bangumi 未找到结果")
-            return []
+        
+        return self._merge_results(local_results, results, prefer_local=on_local is not None, fuzzy_results=local_fuzzy)
+    
+    def _merge_results(self, local_results, remote_results, prefer_local, fuzzy_results=()):
+        """合并本地和远程结果，同一条目只保留一个（使用远程的最新信息），本地的模糊结果补在最后"""
+        remote_by_key = {LocalSearchIndex.subject_key(info): info for info in remote_results}
+        local_keys = {LocalSearchIndex.subject_key(info) for info in local_results}
+        
+        merged_local = []
+        for info in local_results:
+            key = LocalSearchIndex.subject_key(info)
+            merged_local.append({**info, **remote_by_key[key]} if key in remote_by_key else info)
+        remote_only = [info for info in remote_results if LocalSearchIndex.subject_key(info) not in local_keys]
+        
+        if prefer_local:
+            merged = merged_local + remote_only
+        else:
+            remote_keys = set(remote_by_key)
+            merged = remote_results + [info for info in merged_local if LocalSearchIndex.subject_key(info) not in remote_keys]
+        merged_keys = {LocalSearchIndex.subject_key(info) for info in merged}
+        return merged + [info for info in fuzzy_results if LocalSearchIndex.subject_key(info) not in merged_keys]
+
+
+def read_watch_list(path):
+    """读取待导入的列表（JSON或CSV），返回 (类型, 值) 列表，类型为 'id'（Bangumi条目ID）或 'title'（动漫名称）
+    
+    CSV按id/title列、JSON对象按id/title键区分；JSON数组中的整数视为条目ID，字符串视为名称（"86"这样的名称不会被当作ID）
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            items = list(csv.DictReader(f))
+        else:
+            items = json.load(f)
+    
+    entries = []
+    for item in items:
+        if isinstance(item, dict):
+            if item.get('id'):
+                entries.append(('id', item['id']))
+            elif item.get('title'):
+                entries.append(('title', item['title']))
+        elif isinstance(item, int) and not isinstance(item, bool):
+            entries.append(('id', item))
+        elif item:
+            entries.append(('title', item))
+    return [(kind, str(value).strip()) for kind, value in entries if str(value).strip()]
+
+
+def import_watch_list(db, downloader, path, uid, state, max_workers=5):
+    """导入列表：并发从Bangumi获取信息后批量写入数据库"""
+    def resolve(entry):
+        kind, value = entry
+        try:
+            if kind == 'id':
+                return downloader.get_subject(value)
+            results = downloader.search_anime(value, max_results=1)
+            return results[0] if results else None
+        except Exception as e:
+            print(f"获取动漫信息失败 {value}: {e}")
+            return None
+    
+    entries = read_watch_list(path)
+    # 使用独立的线程池：resolve内部的请求可能再提交到下载器自己的线程池，共用会互相等待而死锁
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import") as executor:
+        anime_infos = [info for info in executor.map(resolve, entries) if info and info.get('title')]
+    print(f"共 {len(entries)} 项，成功获取 {len(anime_infos)} 项")
+    return db.import_animes(anime_infos, uid, state)
+
+
+def export_watch_list(db, uid, state, out):
+    """以JSON Lines格式导出列表，每行一部动漫"""
+    count = 0
+    for row in db.export_animes(uid, state):
+        out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        count += 1
+    return count
+
+
+def benchmark_schema(path, rows=100000, repeat=200):
+    """在SQLite上生成rows条数据，对比有无迁移v2/v4索引时热点查询的平均耗时（毫秒）"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    
+    db = SQLiteDatabaseManager(path)
+    db.check_user_exists(1)
+    
+    # 生成测试数据，一半追番中，一半看完了
+    def generate(start, stop):
+        for i in range(start, stop):
+            yield {
+                'title': f"ベンチマーク{i}",
+                'name_cn': f"测试动漫{i}",
+                'air_date': '2020-01-01',
+                'episodes': '全12话',
+                'rating': '7.5',
+                'source': 'Bangumi',
+                'summary': '简介' * 100,
+                'cover_url': f"https://lain.bgm.tv/pic/cover/l/{i}.jpg",
+                'id': i + 1
+            }
+    
+    start = time.perf_counter()
+    db.import_animes(generate(0, rows // 2), 1, 'watching', chunk_size=5000)
+    db.import_animes(generate(rows // 2, rows), 1, 'finished', chunk_size=5000)
+    print(f"生成 {rows} 条数据耗时 {time.perf_counter() - start:.1f}s")
+    
+    # 收集统计信息，让查询规划器能在排序索引和筛选索引之间做出选择
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("ANALYZE")
+        conn.commit()
+    
+    FULLWIDTH_DIGITS = str.maketrans("0123456789", "０１２３４５６７８９")
+    
+    def last_page_cursor():
+        animes = db.get_animes_page(1, 'watching', limit=1, offset=rows // 2 - 41)
+        return (animes[0]['acn_name'], animes[0]['aid'])
+    
+    reads = [
+        ("anime_exists 按名称", lambda i: db.anime_exists(f"测试动漫{i}", 'Bangumi')),
+        ("anime_exists 按条目ID", lambda i: db.anime_exists(None, 'Bangumi', bgm_id=i + 1)),
+        ("anime_exists 全角标题", lambda i: db.anime_exists(f"测试动漫{i}".translate(FULLWIDTH_DIGITS), 'Bangumi')),
+        ("get_animes_after 第一页", lambda i: db.get_animes_after(1, 'watching', limit=40)),
+        ("get_animes_after 最后一页", lambda i, cursor=last_page_cursor(): db.get_animes_after(1, 'watching', cursor, limit=40)),
+        ("get_animes_page 最后一页", lambda i: db.get_animes_page(1, 'watching', limit=40, offset=rows // 2 - 40)),
+    ]
+    writes = [
+        ("add_to_category 已存在", lambda i: db.add_to_category(i + 1, 1, 'watching' if i < rows // 2 else 'finished')),
+    ]
+    
+    def measure(func, count, in_memory=False):
+        elapsed = 0
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            for n in range(count):
+                i = (n * 7919) % rows
+                if not in_memory:
+                    # 只统计数据库本身的耗时
+                    db.invalidate_cache()
+                    db.clear_title_index()
+                start = time.perf_counter()
+                func(i)
+                elapsed += time.perf_counter() - start
+        return elapsed / count * 1000
+    
+    # 排序和分页查询较慢，减少执行次数
+    counts = {name: max(repeat // 20, 5) if 'get_animes' in name else repeat for name, _ in reads + writes}
+    
+    with_index = {name: measure(func, counts[name]) for name, func in reads + writes}
+    
+    # 进程内索引预热后的存在性检查，不访问数据库
+    db.warm_title_index()
+    in_memory = {name: measure(func, repeat, in_memory=True) for name, func in reads if name.startswith('anime_exists')}
+    
+    # 删除迁移v2/v4/v6的二级索引后重新测量只读查询
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        for name in ('idx_animesinfo_source_cn_name', 'uk_animesinfo_source_name_no_bgm', 'uk_animesinfo_source_bgm',
+                     'idx_recordinfo_user_state', 'uk_recordinfo_user_anime_state', 'idx_animesinfo_name',
+                     'idx_animesinfo_source_cn_key', 'idx_animesinfo_source_jp_key'):
+            cursor.execute(f"DROP INDEX {name}")
+        conn.commit()
+    without_index = {name: measure(func, counts[name]) for name, func in reads}
+    
+    print(f"{'查询':<24}{'有索引(ms)':>12}{'无索引(ms)':>12}{'进程内(ms)':>12}")
+    for name, _ in reads + writes:
+        without = f"{without_index[name]:.3f}" if name in without_index else '-'
+        memory = f"{in_memory[name]:.4f}" if name in in_memory else '-'
+        print(f"{name:<24}{with_index[name]:>12.3f}{without:>12}{memory:>12}")
+    return with_index, without_index
+
+
+def main(argv=None):
+    """命令行入口：不带参数时启动图形界面"""
+    parser = argparse.ArgumentParser(description="动漫信息下载器")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="数据库后端，默认读取 ANIMES_DB_BACKEND")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    import_parser = subparsers.add_parser('import', help="从JSON/CSV导入Bangumi条目ID或动漫名称")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--state', choices=['watching', 'finished'], default='watching')
+    import_parser.add_argument('--uid', type=int, default=1)
+    
+    export_parser = subparsers.add_parser('export', help="以JSON Lines格式导出列表")
+    export_parser.add_argument('--state', choices=['watching', 'finished'])
+    export_parser.add_argument('--uid', type=int, default=1)
+    export_parser.add_argument('-o', '--output', help="输出文件，默认输出到标准输出")
+    
+    migrate_parser = subparsers.add_parser('migrate', help="执行数据库结构迁移")
+    migrate_parser.add_argument('--target', type=int, help="目标版本，默认迁移到最新")
+    
+    bench_parser = subparsers.add_parser('bench-schema', help="在临时SQLite数据库上测试索引对查询耗时的影响")
+    bench_parser.add_argument('--rows', type=int, default=100000)
+    bench_parser.add_argument('--path', default=os.path.join(CACHE_DIR, "bench.sqlite3"))
+    
+    args = parser.parse_args(argv)
+    
+    if args.command is None:
+        app = AnimeInfoDownloaderGUI(backend=args.backend)
+        app.run()
+        return
+    
+    if args.command == 'bench-schema':
+        os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+        benchmark_schema(args.path, args.rows)
+        return
+    
+    if args.command == 'migrate':
+        backend = args.backend or DB_BACKEND
+        db = MySQLDatabaseManager(auto_migrate=False) if backend == 'mysql' else SQLiteDatabaseManager(auto_migrate=False)
+        print(f"当前数据库结构版本: v{db.migrate(args.target)}")
+        return
+    
+    # 日志输出到标准错误，标准输出只留给导出的数据
+    stdout = sys.stdout
+    with redirect_stdout(sys.stderr):
+        db = create_database_manager(args.backend)
+        
+        if args.command == 'import':
+            db.check_user_exists(args.uid)
+            count = import_watch_list(db, AnimeInfoDownloader(), args.path, args.uid, args.state)
+            print(f"导入完成：{count} 条")
+        elif args.command == 'export':
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as out:
+                    count = export_watch_list(db, args.uid, args.state, out)
+            else:
+                count = export_watch_list(db, args.uid, args.state, stdout)
+            print(f"导出完成：{count} 条")
 
 
 if __name__ == "__main__":
-    app = AnimeInfoDownloaderGUI()
-    app.run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""Bangumi v0搜索接口测试（本地模拟服务器，通过 api_base 指向）"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from main import AnimeInfoDownloader, LocalSearchIndex, ResponseCache
+
+SUBJECTS = [
+    {
+        'id': 1000 + i,
+        'name': f"タイトル{i}",
+        'name_cn': f"动漫{i}",
+        'date': '2020-04-01',
+        'eps': 12,
+        'total_episodes': 13,
+        'rating': {'score': 7.5},
+        'images': {'large': f"https://lain.bgm.tv/pic/cover/l/{i}.jpg"},
+        'summary': f"<br>简介{i}",
+        'platform': 'TV'
+    }
+    for i in range(25)
+]
+
+
+def legacy_subject(subject):
+    """旧搜索接口中同一条目的格式"""
+    return {
+        'id': subject['id'],
+        'name': subject['name'],
+        'name_cn': subject['name_cn'],
+        'air_date': subject['date'],
+        'eps_count': subject['eps'],
+        'rating': subject['rating'],
+        'images': subject['images'],
+        'summary': subject['summary'],
+        'platform': subject['platform']
+    }
+
+
+class MockBangumi(BaseHTTPRequestHandler):
+    requests = []
+
+    def _send(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        limit, offset = int(query['limit'][0]), int(query['offset'][0])
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.requests.append(('POST', url.path, limit, offset))
+        self._send({'total': len(SUBJECTS), 'limit': limit, 'offset': offset,
+                    'data': SUBJECTS[offset:offset + limit]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.requests.append(('GET', url.path))
+        self._send({'results': len(SUBJECTS), 'list': [legacy_subject(subject) for subject in SUBJECTS]})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockBangumi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    MockBangumi.requests = []
+    yield AnimeInfoDownloader(
+        search_backend='v0',
+        api_base=f"http://127.0.0.1:{server.server_address[1]}",
+        response_cache=ResponseCache(str(tmp_path / "responses.sqlite3")),
+        local_index=LocalSearchIndex(str(tmp_path / "search.sqlite3"))
+    )
+    server.shutdown()
+    server.server_close()
+
+
+def test_v0_search_pages_until_total(downloader):
+    results = downloader.search_bangumi_v0("动漫", max_results=30)
+    assert [result['id'] for result in results] == [subject['id'] for subject in SUBJECTS]
+    assert MockBangumi.requests == [('POST', '/v0/search/subjects', 20, 0), ('POST', '/v0/search/subjects', 10, 20)]
+
+
+def test_v0_results_match_legacy_shape(downloader):
+    v0 = downloader.search_bangumi_v0("动漫", max_results=1)[0]
+    legacy = downloader.search_bangumi("动漫", max_results=1)[0]
+    assert v0.keys() == legacy.keys()
+    assert {**v0, 'detail_level': None} == {**legacy, 'detail_level': None}
+    assert v0['detail_level'] == 'full'
+    assert v0['episodes'] == "全12话"
+    assert v0['summary'] == "简介0"
+
+
+def test_repeated_v0_query_served_from_cache(downloader):
+    first = downloader.search_bangumi_v0("动漫", max_results=5)
+    count = len(MockBangumi.requests)
+    assert downloader.search_bangumi_v0("动漫", max_results=5) == first
+    assert len(MockBangumi.requests) == count
+    assert downloader.response_cache.stats()['hits'] == 1
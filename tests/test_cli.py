@@ -0,0 +1,18 @@
+"""命令行入口测试"""
+import main as app
+
+
+def test_backend_option_passed_to_gui(monkeypatch):
+    created = []
+
+    class FakeGUI:
+        def __init__(self, backend=None):
+            created.append(backend)
+
+        def run(self):
+            pass
+
+    monkeypatch.setattr(app, 'AnimeInfoDownloaderGUI', FakeGUI)
+    app.main(['--backend', 'sqlite'])
+    app.main([])
+    assert created == ['sqlite', None]
@@ -0,0 +1,184 @@
+"""ConnectionPool 与 SQLiteDatabaseManager 连接池行为测试"""
+import threading
+import time
+
+import pytest
+
+from main import ConnectionPool, SQLiteDatabaseManager
+
+
+class FakeConnection:
+    """记录回滚和关闭次数的假连接"""
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        if self.broken:
+            raise RuntimeError("连接已断开")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def check(conn):
+    """健康检查：已断开的连接抛出异常"""
+    if conn.broken:
+        raise RuntimeError("连接已断开")
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(factory, check=check, **kwargs), created
+
+
+def test_concurrent_checkouts_never_exceed_max_size():
+    pool, created = make_pool(min_size=1, max_size=3, timeout=5)
+    pool.warm_up()
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def worker():
+        with pool.connection():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 3
+    assert len(created) == 3
+    assert pool.size == 3
+    assert len(pool.idle) == 3
+
+
+def test_acquire_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.1)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_failed_health_check_discards_connection():
+    pool, created = make_pool(max_size=2, check_after=0)
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert conn.closed
+    assert len(created) == 2
+    assert pool.size == 1
+
+
+def test_recently_returned_connection_skips_health_check():
+    checks = []
+    pool = ConnectionPool(FakeConnection, check=checks.append, check_after=0.05)
+    with pool.connection() as conn:
+        pass
+    with pool.connection():
+        pass
+    assert checks == []
+
+    time.sleep(0.1)
+    with pool.connection():
+        pass
+    assert checks == [conn]
+
+
+def test_rollback_only_when_transaction_open():
+    pool = ConnectionPool(FakeConnection, in_transaction=lambda conn: conn.open_transaction)
+    with pool.connection() as conn:
+        conn.open_transaction = False
+    assert conn.rollbacks == 0
+
+    with pool.connection() as conn:
+        conn.open_transaction = True
+    assert conn.rollbacks == 1
+
+    # 出错时无论是否在事务中都回滚
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.open_transaction = False
+            raise ValueError()
+    assert conn.rollbacks == 2
+
+
+def test_idle_connections_expire_down_to_min_size():
+    pool, created = make_pool(min_size=1, max_size=3, idle_timeout=0.05)
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    assert pool.size == 3
+
+    time.sleep(0.1)
+    with pool.connection():
+        pass
+    assert pool.size == 1
+    assert sum(conn.closed for conn in created) == 2
+
+
+def test_connection_returned_on_error_and_early_exit():
+    pool, _ = make_pool(max_size=1, timeout=0.1)
+
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError()
+    assert len(pool.idle) == 1
+
+    def rows():
+        with pool.connection() as conn:
+            yield conn
+            yield conn
+
+    iterator = rows()
+    next(iterator)
+    assert len(pool.idle) == 0
+    iterator.close()
+    assert len(pool.idle) == 1
+    assert pool.size == 1
+
+
+def test_broken_connection_discarded_on_return():
+    pool, _ = make_pool(max_size=1)
+    with pool.connection() as conn:
+        conn.broken = True
+    assert conn.closed
+    assert pool.size == 0
+
+
+def test_abandoned_export_iterators_release_connections(tmp_path):
+    db = SQLiteDatabaseManager(path=str(tmp_path / "animes.sqlite3"), max_connections=2)
+    db.check_user_exists(1)
+    db.import_animes(
+        ({'title': f"タイトル{i}", 'name_cn': f"动漫{i}", 'source': 'Bangumi', 'id': i + 1} for i in range(10)),
+        1, 'watching'
+    )
+
+    for _ in range(2):
+        iterator = db.export_animes(1)
+        next(iterator)
+        del iterator
+
+    assert db.pool.size == len(db.pool.idle)
+    assert len(list(db.export_animes(1))) == 10
+    db.pool.close()
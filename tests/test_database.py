@@ -0,0 +1,176 @@
+"""DatabaseManager 在SQLite后端上的行为测试"""
+import pytest
+
+from main import SCHEMA_MIGRATIONS, DatabaseManager, SQLiteDatabaseManager, normalize_title
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDatabaseManager(path=str(tmp_path / "animes.sqlite3"))
+    db.check_user_exists(1)
+    yield db
+    db.pool.close()
+
+
+def anime(title, bgm_id=None, name_cn=None, source='Bangumi'):
+    info = {'title': title, 'name_cn': name_cn, 'source': source}
+    if bgm_id is not None:
+        info['id'] = bgm_id
+    return info
+
+
+def all_pages(db, state, limit):
+    """按游标读取分类的所有页"""
+    animes, cursor = [], None
+    while True:
+        page = db.get_animes_after(1, state, cursor, limit=limit)
+        animes.extend(page)
+        if len(page) < limit:
+            return animes
+        cursor = (page[-1]['acn_name'], page[-1]['aid'])
+
+
+def test_keyset_paging_with_missing_chinese_names(db):
+    for i in range(7):
+        db.add_anime_to_category(anime(f"タイトル{i}", i + 1, name_cn=None if i % 2 else f"动漫{i}"), 1, 'watching')
+    assert len(all_pages(db, 'watching', 2)) == 7
+
+
+def test_migration_fills_null_chinese_names(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    old = SQLiteDatabaseManager(path=path, auto_migrate=False)
+    old.migrate(target_version=4)
+    with old.pool.connection() as conn, conn.cursor() as cursor:
+        for i in range(7):
+            cursor.execute("INSERT INTO animesinfo (acn_name, ajp_name, source) VALUES (%s, %s, 'Bangumi')",
+                           (None if i < 4 else f"动漫{i}", f"タイトル{i}"))
+            cursor.execute("INSERT INTO recordinfo (uid, aid, state) VALUES (1, %s, 'watching')", (cursor.lastrowid,))
+        conn.commit()
+    old.pool.close()
+
+    db = SQLiteDatabaseManager(path=path)
+    assert len(all_pages(db, 'watching', 2)) == 7
+    db.pool.close()
+
+
+def test_same_title_with_different_subject_ids_kept_apart(db):
+    first, _ = db.add_anime_to_category(anime("フルーツバスケット", 100), 1, 'watching')
+    second, _ = db.add_anime_to_category(anime("フルーツバスケット", 200), 1, 'watching')
+    assert first != second
+    assert db.get_anime_by_id(second)['bgm_id'] == 200
+
+    db.clear_title_index()
+    assert db.anime_exists("フルーツバスケット", 'Bangumi', 100) == first
+    assert db.anime_exists("フルーツバスケット", 'Bangumi', 200) == second
+    assert db.bgm_index[('Bangumi', '200')] == second
+
+
+def test_same_title_without_subject_id_saved_once(db):
+    first = db.insert_anime(anime("CLANNAD"))
+    assert db.insert_anime(anime("CLANNAD")) == first
+    db.clear_title_index()
+    assert db.insert_anime(anime("ＣＬＡＮＮＡＤ")) == first
+
+
+def test_import_resolves_subject_stored_under_another_title(db):
+    aid = db.insert_anime(anime("旧タイトル", 300))
+    imported = db.import_animes([anime("新タイトル", 300), anime("別のアニメ", 301)], 1, 'watching')
+    assert imported == 2
+    animes = db.get_animes_by_state(1, 'watching')
+    assert aid in {row['aid'] for row in animes}
+    assert len(animes) == 2
+
+
+def test_import_matches_width_and_case_variants(db):
+    aid = db.insert_anime(anime("ＣＬＡＮＮＡＤ"))
+    db.clear_title_index()
+    assert db.import_animes([anime("ｃｌａｎｎａｄ"), anime("Clannad"), anime("AIR"), anime("ＡＩＲ")], 1, 'watching') == 4
+
+    animes = db.get_animes_by_state(1, 'watching')
+    assert len(animes) == 2
+    assert aid in {row['aid'] for row in animes}
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS count FROM animesinfo")
+        assert cursor.fetchone()['count'] == 2
+
+
+def test_title_index_warmed_on_demand(tmp_path):
+    path = str(tmp_path / "animes.sqlite3")
+    first = SQLiteDatabaseManager(path=path)
+    aid = first.insert_anime(anime("けいおん!", 400))
+    first.pool.close()
+
+    db = SQLiteDatabaseManager(path=path)
+    assert db.bgm_index == {}
+    assert db.anime_exists("けいおん!", 'Bangumi', 400) == aid
+    db.clear_title_index()
+    assert db.warm_title_index() == 1
+    assert db.bgm_index[('Bangumi', '400')] == aid
+    db.pool.close()
+
+
+def test_migration_merges_duplicate_rows_before_unique_keys(tmp_path):
+    path = str(tmp_path / "v1.sqlite3")
+    old = SQLiteDatabaseManager(path=path, auto_migrate=False)
+    old.migrate(target_version=1)
+    with old.pool.connection() as conn, conn.cursor() as cursor:
+        aids = []
+        for name in ("けいおん!", "けいおん!", "AIR"):
+            cursor.execute("INSERT INTO animesinfo (acn_name, ajp_name, source) VALUES (%s, %s, 'Bangumi')", (name, name))
+            aids.append(cursor.lastrowid)
+        for aid in aids + [aids[0]]:
+            cursor.execute("INSERT INTO recordinfo (uid, aid, state) VALUES (1, %s, 'watching')", (aid,))
+        conn.commit()
+    old.pool.close()
+
+    db = SQLiteDatabaseManager(path=path)
+    assert db.migrate() == max(migration['version'] for migration in SCHEMA_MIGRATIONS)
+    animes = db.get_animes_by_state(1, 'watching')
+    assert sorted(row['aid'] for row in animes) == [aids[0], aids[2]]
+    assert db.insert_anime(anime("けいおん!")) == aids[0]
+    db.pool.close()
+
+
+def test_anime_exists_with_subject_id_ignores_other_subjects_of_same_name(db):
+    first, _ = db.add_anime_to_category(anime("フルーツバスケット", 100), 1, 'watching')
+    assert db.anime_exists("フルーツバスケット", 'Bangumi', 200) is None
+    db.clear_title_index()
+    assert db.anime_exists("フルーツバスケット", 'Bangumi', 200) is None
+    assert db.anime_exists("フルーツバスケット", 'Bangumi') == first
+
+
+def insert_legacy(db, title):
+    """插入旧版本保存的、没有条目ID的动漫"""
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("INSERT INTO animesinfo (acn_name, ajp_name, source, cn_key, jp_key) VALUES (%s, %s, 'Bangumi', %s, %s)",
+                       (title, title, normalize_title(title), normalize_title(title)))
+        conn.commit()
+        return cursor.lastrowid
+
+
+def test_subject_id_claims_legacy_row_of_same_title(db):
+    legacy = insert_legacy(db, "けいおん!")
+    assert db.add_anime_to_category(anime("けいおん!", 400), 1, 'watching')[0] == legacy
+    assert db.get_anime_by_id(legacy)['bgm_id'] == 400
+    # 已被认领的记录不会再被同名的其他条目使用
+    assert db.add_anime_to_category(anime("けいおん!", 401), 1, 'watching')[0] != legacy
+    assert len(db.get_animes_by_state(1, 'watching')) == 2
+
+
+def test_import_claims_legacy_rows_once(db):
+    legacy = insert_legacy(db, "けいおん!")
+    assert db.import_animes([anime("けいおん!", 400), anime("けいおん!", 401), anime("けいおん!", 400)], 1, 'watching') == 3
+    assert db.get_anime_by_id(legacy)['bgm_id'] == 400
+    assert db.anime_exists(None, 'Bangumi', 400) == legacy
+    assert len(db.get_animes_by_state(1, 'watching')) == 2
+
+
+def test_backend_missing_methods_fails_at_construction(tmp_path):
+    with pytest.raises(TypeError):
+        DatabaseManager()
+
+    class IncompleteManager(SQLiteDatabaseManager):
+        _upsert_record = DatabaseManager._upsert_record
+
+    with pytest.raises(TypeError):
+        IncompleteManager(path=str(tmp_path / "animes.sqlite3"))
@@ -0,0 +1,32 @@
+"""ImageCache 缩略图生成测试"""
+import io
+
+from PIL import Image
+
+from main import DiskCache, ImageCache
+
+
+def jpeg_bytes(size=(400, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_thumbnail_uses_given_bytes_when_disk_cache_cannot_hold_them(tmp_path):
+    data = jpeg_bytes()
+    cache = ImageCache(disk_cache=DiskCache(str(tmp_path), max_bytes=len(data) // 2))
+    cache.disk_cache.set("http://example.com/a.jpg", data)
+
+    thumbnail = cache.get_thumbnail("http://example.com/a.jpg", (100, 150), data=data)
+    assert thumbnail is not None
+    assert thumbnail.size == (100, 150)
+
+
+def test_corrupt_cached_thumbnail_regenerated_from_original(tmp_path):
+    url = "http://example.com/b.jpg"
+    cache = ImageCache(disk_cache=DiskCache(str(tmp_path)))
+    cache.disk_cache.set(url, jpeg_bytes())
+    cache.disk_cache.set(ImageCache._thumbnail_key(url, (100, 150)), b"not an image")
+
+    thumbnail = cache.get_thumbnail(url, (100, 150))
+    assert thumbnail.size == (100, 150)
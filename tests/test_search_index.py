@@ -0,0 +1,57 @@
+"""LocalSearchIndex 本地搜索测试"""
+import sqlite3
+
+from main import AnimeInfoDownloader, LocalSearchIndex, ResponseCache
+
+
+def subject(bgm_id, title, name_cn='', summary=''):
+    return {'id': bgm_id, 'title': title, 'name_cn': name_cn, 'summary': summary, 'source': 'Bangumi'}
+
+
+def titles(results):
+    return [result['title'] for result in results]
+
+
+def test_search_ignores_width_and_case(tmp_path):
+    index = LocalSearchIndex(str(tmp_path / "search.sqlite3"))
+    index.add_many([subject(1, "CLANNAD ～AFTER STORY～"), subject(2, "ＡＩＲ", "青空"), subject(3, "Kanon")])
+
+    assert titles(index.search("Ｃｌａｎｎａｄ")) == ["CLANNAD ～AFTER STORY～"]
+    assert titles(index.search("clannad after story")) == ["CLANNAD ～AFTER STORY～"]
+    assert titles(index.search("air")) == ["ＡＩＲ"]
+    assert titles(index.search("ＫＡＮＯＮ")) == ["Kanon"]
+
+
+def test_existing_index_rebuilt_with_normalized_text(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    index = LocalSearchIndex(path)
+    index.add(subject(1, "ＣＬＡＮＮＡＤ"))
+    # 模拟旧版本按原文收录的索引
+    index.conn.execute("UPDATE subjects SET name = 'ＣＬＡＮＮＡＤ'")
+    index.conn.execute("UPDATE subjects_fts SET name = 'ＣＬＡＮＮＡＤ'")
+    index.conn.execute("PRAGMA user_version = 0")
+    index.conn.commit()
+    index.conn.close()
+
+    index = LocalSearchIndex(path)
+    assert titles(index.search("clannad")) == ["ＣＬＡＮＮＡＤ"]
+    assert sqlite3.connect(path).execute("PRAGMA user_version").fetchone()[0] == LocalSearchIndex.INDEX_VERSION
+
+
+def test_fuzzy_matches_only_names_and_rank_after_remote(tmp_path):
+    index = LocalSearchIndex(str(tmp_path / "search.sqlite3"))
+    one_piece = subject(10, "ONE PIECE", "海贼王", summary="寻找传说中的巨人族和秘宝的冒险")
+    index.add_many([one_piece, subject(11, "進撃の巨人 The Final Season", "进击的巨人 最终季")])
+
+    matched, fuzzy = index.search_parts("进击的巨人")
+    assert titles(matched) == ["進撃の巨人 The Final Season"]
+    assert fuzzy == []
+
+    matched, fuzzy = index.search_parts("进击的巨大")
+    assert matched == []
+    assert titles(fuzzy) == ["進撃の巨人 The Final Season"]
+
+    downloader = AnimeInfoDownloader(response_cache=ResponseCache(str(tmp_path / "responses.sqlite3")), local_index=index)
+    remote = [subject(20, "進撃の巨人", "进击的巨人")]
+    merged = downloader._merge_results([], remote, prefer_local=True, fuzzy_results=fuzzy)
+    assert titles(merged) == ["進撃の巨人", "進撃の巨人 The Final Season"]
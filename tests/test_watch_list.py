@@ -0,0 +1,41 @@
+"""导入列表的读取与解析测试"""
+import json
+
+from main import SQLiteDatabaseManager, import_watch_list, read_watch_list
+
+
+def test_csv_and_json_keep_id_and_title_apart(tmp_path):
+    csv_path = tmp_path / "list.csv"
+    csv_path.write_text("id,title\n400,\n,86\n", encoding='utf-8')
+    json_path = tmp_path / "list.json"
+    json_path.write_text(json.dumps([{'id': 400}, {'title': "86"}, 401, "86", ""]), encoding='utf-8')
+
+    assert read_watch_list(str(csv_path)) == [('id', '400'), ('title', '86')]
+    assert read_watch_list(str(json_path)) == [('id', '400'), ('title', '86'), ('id', '401'), ('title', '86')]
+
+
+class FakeDownloader:
+    def __init__(self):
+        self.subjects = []
+        self.searches = []
+
+    def get_subject(self, subject_id):
+        self.subjects.append(subject_id)
+        return {'id': subject_id, 'title': f"条目{subject_id}", 'source': 'Bangumi'}
+
+    def search_anime(self, name, max_results=5):
+        self.searches.append(name)
+        return [{'id': 1000, 'title': name, 'source': 'Bangumi'}]
+
+
+def test_numeric_title_searched_by_name(tmp_path):
+    path = tmp_path / "list.json"
+    path.write_text(json.dumps([{'title': "86"}, {'id': 400}]), encoding='utf-8')
+    db = SQLiteDatabaseManager(path=str(tmp_path / "animes.sqlite3"))
+    db.check_user_exists(1)
+    downloader = FakeDownloader()
+
+    assert import_watch_list(db, downloader, str(path), 1, 'watching') == 2
+    assert downloader.subjects == ['400']
+    assert downloader.searches == ["86"]
+    db.pool.close()